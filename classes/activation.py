@@ -0,0 +1,61 @@
+from classes.entities import Enemy
+
+ACTIVATION_RADIUS = 160  # enemies this far outside the screen are still awake
+SLEEP_MARGIN = 32  # extra distance before falling asleep, so enemies don't flicker
+ACTIVATION_CHUNK_SIZE = 128
+
+
+class Activation:
+    def __init__(self, game, enemy_size, radius=ACTIVATION_RADIUS) -> None:
+        self.game = game
+        self.enemy_size = enemy_size
+        self.radius = radius
+        # sleeping enemies are only kept as [x, y, y velocity, flip, walking]
+        self.sleeping = {}  # chunk -> [state]
+        self.count = 0
+
+    def reset(self):
+        self.sleeping = {}
+        self.count = 0
+
+    def update(self, camera):
+        awake_region = camera.rect.inflate(self.radius * 2, self.radius * 2)
+        sleep_region = awake_region.inflate(SLEEP_MARGIN * 2, SLEEP_MARGIN * 2)
+
+        for enemy in self.game.enemies.copy():
+            if not sleep_region.collidepoint(enemy.pos):
+                self.game.enemies.remove(enemy)
+                chunk = (
+                    int(enemy.pos[0] // ACTIVATION_CHUNK_SIZE),
+                    int(enemy.pos[1] // ACTIVATION_CHUNK_SIZE),
+                )
+                self.sleeping.setdefault(chunk, []).append(
+                    (
+                        enemy.pos[0],
+                        enemy.pos[1],
+                        enemy.velocity[1],
+                        enemy.flip,
+                        enemy.walking,
+                    )
+                )
+                self.count += 1
+
+        for chunk in camera.chunks(ACTIVATION_CHUNK_SIZE, self.radius):
+            if chunk not in self.sleeping:
+                continue
+            states = []
+            for state in self.sleeping.pop(chunk):
+                if awake_region.collidepoint(state[0], state[1]):
+                    self.wake(state)
+                else:
+                    states.append(state)
+            if len(states):
+                self.sleeping[chunk] = states
+
+    def wake(self, state):
+        enemy = Enemy(self.game, (state[0], state[1]), self.enemy_size)
+        enemy.velocity[1] = state[2]
+        enemy.flip = state[3]
+        enemy.walking = state[4]
+        self.game.enemies.append(enemy)
+        self.count -= 1
@@ -1,21 +1,53 @@
+import pygame
+
+
 class Animation:
+    # the frames of an animation, shared by everything that plays it
     def __init__(self, images, img_duration=5, loop=True) -> None:
-        self.images = images
+        self.images = tuple(images)
         self.img_duration = img_duration
         self.loop = loop
+
+        # image to show on every frame of the game, so playing needs no math
+        flipped_images = [
+            pygame.transform.flip(img, True, False) for img in self.images
+        ]
+        self.frames = tuple(
+            self.images[i // img_duration]
+            for i in range(img_duration * len(self.images))
+        )
+        self.flipped_frames = tuple(
+            flipped_images[i // img_duration]
+            for i in range(img_duration * len(self.images))
+        )
+        self.length = len(self.frames)
+
+    def cursor(self, frame=0):
+        return AnimationCursor(self, frame)
+
+
+class AnimationCursor:
+    __slots__ = ("clip", "frame", "done")
+
+    def __init__(self, clip, frame=0) -> None:
+        self.clip = clip
+        self.frame = frame  # refers to frames of the game
         self.done = False
-        self.frame = 0  # refers to frames of the game
 
-    def copy(self):
-        return Animation(self.images, self.img_duration, self.loop)
+    def play(self, clip):
+        self.clip = clip
+        self.frame = 0
+        self.done = False
 
-    def update(self):
-        if self.loop:
-            self.frame = (self.frame + 1) % (self.img_duration * len(self.images))
+    def update(self, steps=1):
+        if self.clip.loop:
+            self.frame = (self.frame + steps) % self.clip.length
         else:
-            self.frame = min(self.frame + 1, self.img_duration * len(self.images) - 1)
-            if self.frame >= self.img_duration * len(self.images) - 1:
+            self.frame = min(self.frame + steps, self.clip.length - 1)
+            if self.frame >= self.clip.length - 1:
                 self.done = True
 
-    def img(self):
-        return self.images[int(self.frame / self.img_duration)]
+    def img(self, flip=False):
+        if flip:
+            return self.clip.flipped_frames[self.frame]
+        return self.clip.frames[self.frame]
@@ -0,0 +1,76 @@
+import math
+import pygame
+
+from scripts.utils import open_data
+
+CHANNEL_COUNT = 16
+HEARING_DISTANCE = 360  # sounds further than this from the camera are silent
+MIN_VOLUME = 0.02  # quieter sounds are not worth a channel
+
+
+class Audio:
+    def __init__(self, sounds, channel_count=CHANNEL_COUNT) -> None:
+        self.sounds = sounds  # name -> [path, volume, priority, plays per frame]
+        self.sfx = {}
+        self.played = {}  # name -> plays this frame
+        self.listener = (0, 0)
+
+        self.enabled = pygame.mixer.get_init() is not None
+        self.channels = []
+        if self.enabled:
+            pygame.mixer.set_num_channels(channel_count)
+            self.channels = [pygame.mixer.Channel(i) for i in range(channel_count)]
+        self.channel_priorities = [0] * len(self.channels)
+
+    def load(self):
+        if not self.enabled:
+            return
+        for name, (path, volume, priority, limit) in self.sounds.items():
+            with open_data(path) as file:
+                sound = pygame.mixer.Sound(file)
+            sound.set_volume(volume)
+            self.sfx[name] = sound
+
+    def update(self, listener):
+        self.listener = listener
+        self.played.clear()
+
+    def find_channel(self, priority):
+        # a free channel, or else the least important one that is less important
+        # than the new sound
+        lowest = None
+        for i, channel in enumerate(self.channels):
+            if not channel.get_busy():
+                return i
+            if self.channel_priorities[i] < priority and (
+                lowest is None
+                or self.channel_priorities[i] < self.channel_priorities[lowest]
+            ):
+                lowest = i
+        return lowest
+
+    def play(self, name, pos=None, loops=0):
+        # sounds that are not loaded yet (or without a mixer) are skipped
+        if name not in self.sfx:
+            return None
+
+        priority, limit = self.sounds[name][2:]
+        if self.played.get(name, 0) >= limit:
+            return None
+
+        volume = 1.0
+        if pos is not None:
+            distance = math.dist(pos, self.listener)
+            volume = max(0, 1 - distance / HEARING_DISTANCE)
+            if volume * self.sfx[name].get_volume() < MIN_VOLUME:
+                return None
+
+        i = self.find_channel(priority)
+        if i is None:
+            return None
+
+        self.played[name] = self.played.get(name, 0) + 1
+        self.channel_priorities[i] = priority
+        self.channels[i].set_volume(volume)
+        self.channels[i].play(self.sfx[name], loops)
+        return self.channels[i]
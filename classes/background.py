@@ -0,0 +1,67 @@
+import pygame
+
+
+class CloudLayer:
+    def __init__(self, clouds, size) -> None:
+        self.depth = sum(cloud.depth for cloud in clouds) / len(clouds)
+        self.speed = sum(cloud.speed for cloud in clouds) / len(clouds)
+
+        # the strip wraps around, so it has to be bigger than the screen by the
+        # biggest cloud to let clouds slide fully out before coming back in
+        self.period = (
+            size[0] + max(cloud.img.get_width() for cloud in clouds),
+            size[1] + max(cloud.img.get_height() for cloud in clouds),
+        )
+        self.strip = pygame.Surface(self.period)
+        self.strip.set_colorkey((0, 0, 0), pygame.RLEACCEL)
+
+        for cloud in clouds:
+            x = cloud.pos[0] % self.period[0]
+            y = cloud.pos[1] % self.period[1]
+            # clouds crossing the edges of the strip are drawn on both sides
+            for shift in [(0, 0), (-1, 0), (0, -1), (-1, -1)]:
+                self.strip.blit(
+                    cloud.img,
+                    (x + shift[0] * self.period[0], y + shift[1] * self.period[1]),
+                )
+
+    def blits(self, size, time, offset=(0, 0)):
+        origin = (
+            (self.speed * time - offset[0] * self.depth) % self.period[0]
+            - self.period[0],
+            -offset[1] * self.depth % self.period[1] - self.period[1],
+        )
+        blits = []
+        for x in [origin[0], origin[0] + self.period[0]]:
+            for y in [origin[1], origin[1] + self.period[1]]:
+                if x < size[0] and y < size[1]:
+                    blits.append((self.strip, (x, y)))
+        return blits
+
+
+class Background:
+    def __init__(self, backdrop, clouds, size, layer_count=4) -> None:
+        self.size = size
+        self.time = 0
+
+        # the backdrop never moves, so it is composed once at the screen size
+        self.backdrop = pygame.Surface(size)
+        self.backdrop.blit(backdrop, (0, 0))
+
+        # clouds are grouped by depth and every group is baked into one strip
+        groups = [[] for i in range(layer_count)]
+        for cloud in clouds.clouds:
+            layer = int((cloud.depth - 0.2) / 0.6 * layer_count)
+            groups[max(0, min(layer_count - 1, layer))].append(cloud)
+        self.layers = [CloudLayer(group, size) for group in groups if len(group)]
+        self.layers.sort(key=lambda x: x.depth)
+
+    def update(self):
+        self.time += 1
+
+    def render(self, surface, offset=(0, 0), time=None):
+        if time is None:
+            time = self.time
+        surface.blit(self.backdrop, (0, 0))
+        for layer in self.layers:
+            surface.blits(layer.blits(self.size, time, offset), False)
@@ -0,0 +1,86 @@
+import math
+import pygame
+
+
+class Camera:
+    def __init__(self, size, tile_size=16, smoothing=20, dead_zone=(0, 0)) -> None:
+        self.size = size
+        self.tile_size = tile_size
+        self.smoothing = smoothing
+        self.dead_zone = dead_zone  # the target moves freely inside this box
+        self.bounds = None  # world rect the view is kept inside, if any
+
+        self.scroll = [0, 0]
+        self.screenshake = 0
+
+        # visible region of the world, worked out once per frame
+        self.render_scroll = (0, 0)
+        self.rect = pygame.Rect(0, 0, size[0], size[1])
+        self.tile_range = ((0, 0), (0, 0))
+
+    def shake(self, amount):
+        self.screenshake = max(amount, self.screenshake)
+
+    def center(self):
+        return (self.scroll[0] + self.size[0] / 2, self.scroll[1] + self.size[1] / 2)
+
+    def update(self, target):
+        target_center = target.center
+        for axis in [0, 1]:
+            distance = target_center[axis] - self.size[axis] / 2 - self.scroll[axis]
+            half_dead_zone = self.dead_zone[axis] / 2
+            if abs(distance) <= half_dead_zone:
+                continue
+            distance -= math.copysign(half_dead_zone, distance)
+            self.scroll[axis] += distance / self.smoothing
+
+        if self.bounds:
+            for axis, (low, high) in enumerate(
+                [
+                    (self.bounds.left, self.bounds.right),
+                    (self.bounds.top, self.bounds.bottom),
+                ]
+            ):
+                if high - low < self.size[axis]:
+                    # a level smaller than the view is kept in the middle of it
+                    self.scroll[axis] = (low + high - self.size[axis]) / 2
+                else:
+                    self.scroll[axis] = max(
+                        low, min(high - self.size[axis], self.scroll[axis])
+                    )
+
+        self.screenshake = max(0, self.screenshake - 1)
+
+        self.update_view()
+
+    def update_view(self):
+        self.render_scroll = (int(self.scroll[0]), int(self.scroll[1]))
+        self.rect.topleft = self.render_scroll
+        self.tile_range = (
+            (
+                self.render_scroll[0] // self.tile_size,
+                (self.render_scroll[0] + self.size[0]) // self.tile_size + 1,
+            ),
+            (
+                self.render_scroll[1] // self.tile_size,
+                (self.render_scroll[1] + self.size[1]) // self.tile_size + 1,
+            ),
+        )
+
+    def chunks(self, chunk_size, margin=0):
+        region = self.rect.inflate(margin * 2, margin * 2)
+        return [
+            (chunk_x, chunk_y)
+            for chunk_x in range(
+                region.left // chunk_size, region.right // chunk_size + 1
+            )
+            for chunk_y in range(
+                region.top // chunk_size, region.bottom // chunk_size + 1
+            )
+        ]
+
+    def shake_offset(self, rng):
+        return (
+            rng.random() * self.screenshake - self.screenshake / 2,
+            rng.random() * self.screenshake - self.screenshake / 2,
+        )
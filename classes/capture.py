@@ -0,0 +1,78 @@
+import os
+import threading
+from queue import Queue, Empty
+
+import pygame
+
+CAPTURE_BUFFERS = 8  # frames that can wait for the writer before some are dropped
+RAW_EXTENSIONS = (".rgb", ".raw")
+
+
+class FrameCapture:
+    # frames are copied into a ring of surfaces made up front, and a writer
+    # thread saves them, so capturing never makes the game wait
+    def __init__(self, path, surface, buffers=CAPTURE_BUFFERS) -> None:
+        self.path = path
+        self.size = surface.get_size()
+        # a raw file is rgb24 frames one after another, anything else is a
+        # folder of numbered pngs
+        self.raw = os.path.splitext(path)[1] in RAW_EXTENSIONS
+        if self.raw:
+            self.file = open(path, "wb")
+        else:
+            os.makedirs(path, exist_ok=True)
+
+        # copies share the format of the surface, so copying a frame is a memcpy
+        self.buffers = [surface.copy() for i in range(buffers)]
+        self.free = Queue()
+        self.ready = Queue()
+        for buffer in self.buffers:
+            self.free.put(buffer)
+
+        self.frame = 0
+        self.written = 0
+        self.dropped = []  # frame numbers that were never written
+        self.writer = threading.Thread(target=self.write_frames, daemon=True)
+        self.writer.start()
+
+    def capture(self, surface):
+        try:
+            buffer = self.free.get_nowait()
+        except Empty:
+            # the writer is behind, the frame is lost instead of the game waiting
+            self.dropped.append(self.frame)
+        else:
+            buffer.blit(surface, (0, 0))
+            self.ready.put((self.frame, buffer))
+        self.frame += 1
+
+    def write_frames(self):
+        while True:
+            item = self.ready.get()
+            if item is None:
+                return
+            frame, buffer = item
+            if self.raw:
+                self.file.write(pygame.image.tobytes(buffer, "RGB"))
+            else:
+                # pngs are numbered by game frame, so dropped frames leave gaps
+                pygame.image.save(buffer, os.path.join(self.path, f"{frame:06d}.png"))
+            self.written += 1
+            self.free.put(buffer)
+
+    def close(self):
+        # frames already copied are still written
+        self.ready.put(None)
+        self.writer.join()
+        if self.raw:
+            self.file.close()
+
+        print(
+            f"Captured {self.written}/{self.frame} frames to {self.path}, "
+            f"{len(self.dropped)} dropped."
+        )
+        if self.raw:
+            print(
+                f"Play it with: ffplay -f rawvideo -pixel_format rgb24 "
+                f"-video_size {self.size[0]}x{self.size[1]} -framerate 60 {self.path}"
+            )
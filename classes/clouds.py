@@ -8,42 +8,18 @@ class Cloud:
         self.speed = speed
         self.depth = depth
 
-    def update(self):
-        self.pos[0] += self.speed
-
-    def render(self, surface, offset=(0, 0)):
-        render_pos = (
-            self.pos[0] - offset[0] * self.depth,
-            self.pos[1] - offset[1] * self.depth,
-        )
-        surface.blit(
-            self.img,
-            (
-                render_pos[0] % (surface.get_width() + self.img.get_width())
-                - self.img.get_width(),
-                render_pos[1] % (surface.get_height() + self.img.get_height())
-                - self.img.get_height(),
-            ),
-        )
-
 
 class Clouds:
-    def __init__(self, cloud_images, count=16) -> None:
+    # only picks where the clouds start and how they move, Background bakes
+    # them into strips and scrolls those
+    def __init__(self, cloud_images, count=16, rng=random) -> None:
         self.clouds = []
 
         for i in range(count):
-            pos = (random.random() * 99999, random.random() * 99999)
-            img = random.choice(cloud_images)
-            speed = random.random() * 0.05 + 0.05
-            depth = random.random() * 0.6 + 0.2
+            pos = (rng.random() * 99999, rng.random() * 99999)
+            img = rng.choice(cloud_images)
+            speed = rng.random() * 0.05 + 0.05
+            depth = rng.random() * 0.6 + 0.2
             self.clouds.append(Cloud(pos, img, speed, depth))
 
         self.clouds.sort(key=lambda x: x.depth)
-
-    def update(self):
-        for cloud in self.clouds:
-            cloud.update()
-
-    def render(self, surface, offset=(0, 0)):
-        for cloud in self.clouds:
-            cloud.render(surface, offset)
@@ -1,25 +1,31 @@
+import re
 import sys
 import pygame
 import time
 import random
-
-from icecream import ic
+import threading
 
 from scripts.utils import load_image, load_images
-from classes.tilemap import Tilemap
+from classes.tilemap import Tilemap, write_map
+from classes.minimap import Minimap, tile_colors
 
 RENDER_SCALE = 2.0
+MESSAGE_DURATION = 2  # seconds
+MAP_NAME_CHARACTER = re.compile(r"[A-Za-z0-9_-]")  # names stay inside maps/
+MINIMAP_RECT = (235, 5, 80, 60)  # on the display, a pixel per tile
 
 
 class Editor:
-    def __init__(self, tilemap_name="") -> None:
-        pygame.init()
+    def __init__(self, tilemap_name="", autosave=None) -> None:
+        pygame.display.init()
+        pygame.font.init()
 
         pygame.display.set_caption(
             "editor" if not tilemap_name else f"editor - {tilemap_name}"
         )
         self.screen = pygame.display.set_mode((640, 480))
         self.display = pygame.Surface((320, 240))
+        self.font = pygame.font.Font(None, 16)
 
         self.clock = pygame.time.Clock()
 
@@ -47,11 +53,33 @@ class Editor:
         self.tile_group = 0
         self.tile_variant = 0
 
+        # the map a pixel per tile, for the minimap and the overview
+        self.minimap = Minimap(self.tilemap, tile_colors(self.assets, self.tile_list))
+        self.minimap_background = pygame.Surface(MINIMAP_RECT[2:], pygame.SRCALPHA)
+        self.minimap_background.fill((0, 0, 0, 150))
+        self.show_minimap = True
+        self.overview = False  # the whole screen shows the map zoomed out
+
         self.left_clicking = False
         self.right_clicking = False
         self.shift = False
         self.on_grid = True
 
+        self.game = None  # kept between play-tests, so assets load only once
+
+        # maps are written on another thread, one save at a time
+        self.autosave = autosave  # seconds between saves of a changed map
+        self.edits = 0  # edits made since the map was loaded
+        self.saved_edits = 0  # edits in the map last written
+        self.saving_edits = 0  # edits in the map being written
+        self.save_ok = False
+        self.last_save = time.time()
+        self.save_thread = None
+        self.save_pending = False
+        self.save_result = ""
+        self.prompt = None  # the name being typed for a new map
+        self.message = ("", 0)  # text, time it disappears
+
         self.total_elapsed_time = [0, 0]
 
     def run(self):
@@ -61,11 +89,16 @@ class Editor:
 
             self.display.fill((0, 0, 0))
 
-            self.scroll[0] += (self.movement[1] - self.movement[0]) * 2
-            self.scroll[1] += (self.movement[3] - self.movement[2]) * 2
+            # the overview scrolls as fast on screen as the map does
+            speed = 2 * self.tilemap.tile_size if self.overview else 2
+            self.scroll[0] += (self.movement[1] - self.movement[0]) * speed
+            self.scroll[1] += (self.movement[3] - self.movement[2]) * speed
             render_scroll = render_scroll = (int(self.scroll[0]), int(self.scroll[1]))
 
-            self.tilemap.render(self.display, render_scroll)
+            if self.overview:
+                self.render_map(self.display.get_rect())
+            else:
+                self.tilemap.render(self.display, render_scroll)
 
             current_tile_image = self.assets[self.tile_list[self.tile_group]][
                 self.tile_variant
@@ -83,7 +116,7 @@ class Editor:
             )  # tilemap mouse pos
 
             # tile preview
-            if not self.right_clicking:
+            if not self.right_clicking and not self.overview:
                 if self.on_grid:
                     self.display.blit(
                         current_tile_image,
@@ -97,17 +130,16 @@ class Editor:
 
             # place tiles
             if self.left_clicking and self.on_grid:
-                self.tilemap.tilemap[f"{tile_pos[0]};{tile_pos[1]}"] = {
-                    "type": self.tile_list[self.tile_group],
-                    "variant": self.tile_variant,
-                    "pos": tile_pos,
-                }
+                # holding the button over the same tile is not an edit
+                if self.tilemap.set_tile(
+                    tile_pos, self.tile_list[self.tile_group], self.tile_variant
+                ):
+                    self.edits += 1
 
             # delete tiles
             if self.right_clicking:
-                key = f"{tile_pos[0]};{tile_pos[1]}"
-                if key in self.tilemap.tilemap:
-                    del self.tilemap.tilemap[key]
+                if self.tilemap.remove_tile(tile_pos):
+                    self.edits += 1
                 for tile in self.tilemap.offgrid_tiles.copy():
                     tile_img = self.assets[tile["type"]][tile["variant"]]
                     tile_rect = pygame.Rect(
@@ -117,27 +149,75 @@ class Editor:
                         tile_img.get_height(),
                     )
                     if tile_rect.collidepoint(mouse_pos):
-                        self.tilemap.offgrid_tiles.remove(tile)
+                        self.tilemap.remove_offgrid(tile)
+                        self.edits += 1
+
+            # minimap
+            if self.show_minimap and not self.overview:
+                self.display.blit(self.minimap_background, MINIMAP_RECT[:2])
+                self.render_map(MINIMAP_RECT)
+                pygame.draw.rect(self.display, (100, 100, 100), MINIMAP_RECT, 1)
 
             self.display.blit(current_tile_image, (5, 5))
 
+            # saving
+            if self.save_thread and not self.save_thread.is_alive():
+                self.save_thread = None
+                self.show_message(self.save_result)
+                # a failed save leaves the map changed, so it is tried again
+                if self.save_ok:
+                    self.saved_edits = self.saving_edits
+                if self.save_pending:
+                    self.save_pending = False
+                    self.save()
+            if (
+                self.autosave
+                and self.edits != self.saved_edits
+                and self.tilemap_name
+                and time.time() - self.last_save >= self.autosave
+            ):
+                self.save()
+
+            if self.prompt is not None:
+                self.render_text(f"save new map as: {self.prompt}_", (5, 225))
+            elif time.time() < self.message[1]:
+                self.render_text(self.message[0], (5, 225))
+
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     self.exit()
 
+                # while a name is typed, key presses only go to the prompt, and
+                # releases still do, so nothing stays held
+                if self.prompt is not None and event.type == pygame.KEYDOWN:
+                    self.type_prompt(event)
+                    continue
+
                 if event.type == pygame.MOUSEBUTTONDOWN:
+                    # clicking the map jumps there instead of editing
+                    if self.overview:
+                        if event.button == 1:
+                            self.jump(self.display.get_rect(), mouse_pos)
+                            self.overview = False
+                        continue
+                    if (
+                        event.button == 1
+                        and self.show_minimap
+                        and pygame.Rect(MINIMAP_RECT).collidepoint(mouse_pos)
+                    ):
+                        self.jump(MINIMAP_RECT, mouse_pos)
+                        continue
                     if event.button == 1:  # left click
                         self.left_clicking = True
                         if not self.on_grid:
-                            self.tilemap.offgrid_tiles.append(
-                                {
-                                    "type": self.tile_list[self.tile_group],
-                                    "variant": self.tile_variant,
-                                    "pos": (
-                                        mouse_pos[0] + self.scroll[0],
-                                        mouse_pos[1] + self.scroll[1],
-                                    ),
-                                }
+                            self.edits += 1
+                            self.tilemap.add_offgrid(
+                                (
+                                    mouse_pos[0] + self.scroll[0],
+                                    mouse_pos[1] + self.scroll[1],
+                                ),
+                                self.tile_list[self.tile_group],
+                                self.tile_variant,
                             )
                     if event.button == 3:  # right click
                         self.right_clicking = True
@@ -191,13 +271,19 @@ class Editor:
                     elif event.key == pygame.K_g:  # on/off offgrid_tiles
                         self.on_grid = not self.on_grid
                     elif event.key == pygame.K_o:  # save tilemap
-                        if self.tilemap_name:
-                            self.tilemap.save(self.tilemap_name)
-                        else:
-                            self.tilemap.save(input("Save new map as: "))
-                        print("Map successfully saved.")
+                        self.save()
                     elif event.key == pygame.K_t:  # autotile
                         self.tilemap.autotile()
+                        self.minimap.reset()
+                        self.edits += 1
+                    elif event.key == pygame.K_p:  # play-test
+                        self.playtest()
+                    elif event.key == pygame.K_m:  # on/off minimap
+                        self.show_minimap = not self.show_minimap
+                    elif event.key == pygame.K_TAB:  # on/off overview
+                        self.overview = not self.overview
+                        self.left_clicking = False
+                        self.right_clicking = False
 
                 if event.type == pygame.KEYUP:
                     if event.key == pygame.K_LEFT or event.key == pygame.K_a:
@@ -223,7 +309,113 @@ class Editor:
 
             self.clock.tick(60)
 
+    def map_origin(self, rect):
+        # the tile in the corner of a map drawn in rect, so the screen is in
+        # the middle of it
+        rect = pygame.Rect(rect)
+        tile_size = self.tilemap.tile_size
+        scale = self.minimap.scale
+        return (
+            (self.scroll[0] + self.display.get_width() / 2) / tile_size
+            - rect.width / 2 / scale,
+            (self.scroll[1] + self.display.get_height() / 2) / tile_size
+            - rect.height / 2 / scale,
+        )
+
+    def render_map(self, rect):
+        self.minimap.render(self.display, rect, self.map_origin(rect))
+
+        # the part of the map on screen
+        scale = self.minimap.scale / self.tilemap.tile_size
+        view = pygame.Rect(
+            0, 0, self.display.get_width() * scale, self.display.get_height() * scale
+        )
+        view.center = pygame.Rect(rect).center
+        pygame.draw.rect(self.display, (255, 255, 255), view, 1)
+
+    def jump(self, rect, pos):
+        # centers the screen on the tile clicked in a map drawn in rect
+        origin = self.map_origin(rect)
+        scale = self.minimap.scale
+        self.scroll = [
+            (origin[0] + (pos[0] - rect[0]) / scale) * self.tilemap.tile_size
+            - self.display.get_width() / 2,
+            (origin[1] + (pos[1] - rect[1]) / scale) * self.tilemap.tile_size
+            - self.display.get_height() / 2,
+        ]
+
+    def save(self):
+        # a new map is named in the window first
+        if not self.tilemap_name:
+            self.prompt = ""
+            return
+        if self.save_thread:
+            self.save_pending = True
+            return
+
+        # the snapshot is taken now, the slow part runs on another thread
+        self.save_thread = threading.Thread(
+            target=self.write, args=(self.tilemap_name, self.tilemap.save_data())
+        )
+        self.save_thread.start()
+        self.saving_edits = self.edits
+        self.last_save = time.time()
+        self.show_message(f"saving {self.tilemap_name}...")
+
+    def write(self, map_name, data):
+        try:
+            write_map(map_name, data)
+            self.save_ok = True
+            self.save_result = f"saved {map_name}"
+        except OSError as e:
+            self.save_ok = False
+            self.save_result = f"could not save {map_name}: {e}"
+
+    def type_prompt(self, event):
+        if event.key == pygame.K_ESCAPE:
+            self.prompt = None
+        elif event.key == pygame.K_RETURN:
+            if self.prompt:
+                self.tilemap_name = self.prompt
+                pygame.display.set_caption(f"editor - {self.tilemap_name}")
+                self.save()
+            self.prompt = None
+        elif event.key == pygame.K_BACKSPACE:
+            self.prompt = self.prompt[:-1]
+        elif MAP_NAME_CHARACTER.fullmatch(event.unicode):
+            self.prompt += event.unicode
+
+    def show_message(self, text):
+        self.message = (text, time.time() + MESSAGE_DURATION)
+
+    def render_text(self, text, pos):
+        self.display.blit(self.font.render(text, False, (255, 255, 255)), pos)
+
+    def playtest(self):
+        # the game is only imported when it is first needed
+        from classes.game import Game
+
+        # the game plays a copy of the map being edited, in the editor's window
+        if self.game:
+            self.game.load_level()
+        else:
+            self.game = Game(
+                self.tilemap_name or "playtest",
+                screen=self.screen,
+                level=self.tilemap,
+                assets=self.assets,
+            )
+        self.game.run()
+
+        # keys may have been let go while playing
+        self.movement = [False, False, False, False]
+        self.left_clicking = False
+        self.right_clicking = False
+        self.shift = False
+
     def exit(self):
+        from icecream import ic
+
         average_elapsed_time = self.total_elapsed_time[0] / self.total_elapsed_time[1]
         ic(average_elapsed_time)
         pygame.quit()
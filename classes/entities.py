@@ -1,14 +1,31 @@
 import pygame
 import math
-import random
-
-from icecream import ic
 
 from classes.particle import Particle
 from classes.spark import Spark
 
+COLLIDE_UP = 1
+COLLIDE_DOWN = 2
+COLLIDE_RIGHT = 4
+COLLIDE_LEFT = 8
+
 
 class PhysicsEntity:
+    __slots__ = (
+        "game",
+        "type",
+        "pos",
+        "size",
+        "velocity",
+        "last_movement",
+        "collisions",
+        "hitbox",
+        "action",
+        "animation",
+        "animation_offset",
+        "flip",
+    )
+
     def __init__(self, game, e_type, pos, size) -> None:
         self.game = game
         self.type = e_type
@@ -16,51 +33,54 @@ class PhysicsEntity:
         self.size = size
         self.velocity = [0, 0]
         self.last_movement = [0, 0]
-        self.collisions = {"up": False, "down": False, "right": False, "left": False}
+        self.collisions = 0  # COLLIDE_* flags
+        self.hitbox = pygame.Rect(0, 0, size[0], size[1])
 
         self.action = ""
+        self.animation = self.game.assets[f"{self.type}/idle"].cursor()
         self.animation_offset = (-3, -3)
         self.flip = False
         self.set_action("idle")
 
     def rect(self):
-        return pygame.Rect(self.pos[0], self.pos[1], self.size[0], self.size[1])
+        # the same rect is moved around instead of making a new one every call
+        self.hitbox.x = int(self.pos[0])
+        self.hitbox.y = int(self.pos[1])
+        return self.hitbox
 
     def set_action(self, action):
         if action != self.action:
             self.action = action
-            self.animation = self.game.assets[f"{self.type}/{self.action}"].copy()
+            self.animation.play(self.game.assets[f"{self.type}/{self.action}"])
 
     def update(self, tilemap, movement=(0, 0)):
-        self.collisions = {"up": False, "down": False, "right": False, "left": False}
+        self.collisions = 0
 
-        frame_movement = (
-            movement[0] + self.velocity[0],
-            movement[1] + self.velocity[1],
-        )
+        frame_movement_x = movement[0] + self.velocity[0]
+        frame_movement_y = movement[1] + self.velocity[1]
 
-        self.pos[0] += frame_movement[0]
+        self.pos[0] += frame_movement_x
         entity_rect = self.rect()
         for rect in tilemap.physics_rects_around(self.pos):
             if entity_rect.colliderect(rect):
-                if frame_movement[0] > 0:
+                if frame_movement_x > 0:
                     entity_rect.right = rect.left
-                    self.collisions["right"] = True
-                if frame_movement[0] < 0:
+                    self.collisions |= COLLIDE_RIGHT
+                if frame_movement_x < 0:
                     entity_rect.left = rect.right
-                    self.collisions["left"] = True
+                    self.collisions |= COLLIDE_LEFT
                 self.pos[0] = entity_rect.x
 
-        self.pos[1] += frame_movement[1]
+        self.pos[1] += frame_movement_y
         entity_rect = self.rect()
         for rect in tilemap.physics_rects_around(self.pos):
             if entity_rect.colliderect(rect):
-                if frame_movement[1] > 0:
+                if frame_movement_y > 0:
                     entity_rect.bottom = rect.top
-                    self.collisions["down"] = True
-                if frame_movement[1] < 0:
+                    self.collisions |= COLLIDE_DOWN
+                if frame_movement_y < 0:
                     entity_rect.top = rect.bottom
-                    self.collisions["up"] = True
+                    self.collisions |= COLLIDE_UP
                 self.pos[1] = entity_rect.y
 
         if movement[0] > 0:
@@ -72,16 +92,17 @@ class PhysicsEntity:
             5, self.velocity[1] + 0.1
         )  # 5 is the terminal downwards velocity
 
-        if self.collisions["down"] or self.collisions["up"]:
+        if self.collisions & (COLLIDE_DOWN | COLLIDE_UP):
             self.velocity[1] = 0
 
-        self.last_movement = list(movement)
+        self.last_movement[0] = movement[0]
+        self.last_movement[1] = movement[1]
 
         self.animation.update()
 
     def render(self, surface, offset=(0, 0)):
         surface.blit(
-            pygame.transform.flip(self.animation.img(), self.flip, False),
+            self.animation.img(self.flip),
             (
                 self.pos[0] - offset[0] + self.animation_offset[0],
                 self.pos[1] - offset[1] + self.animation_offset[1],
@@ -90,6 +111,8 @@ class PhysicsEntity:
 
 
 class Player(PhysicsEntity):
+    __slots__ = ("air_time", "available_jumps", "wall_slide", "dashing")
+
     def __init__(self, game, pos, size) -> None:
         super().__init__(game, "player", pos, size)
         self.air_time = 0
@@ -105,16 +128,16 @@ class Player(PhysicsEntity):
         if self.air_time > 240:
             self.game.dead_for += 40
 
-        if self.collisions["down"]:
+        if self.collisions & COLLIDE_DOWN:
             self.air_time = 0
             self.available_jumps = 1
 
         self.wall_slide = False
-        if (self.collisions["left"] or self.collisions["right"]) and self.air_time > 4:
+        if self.collisions & (COLLIDE_LEFT | COLLIDE_RIGHT) and self.air_time > 4:
             self.wall_slide = True
             # 0.5 is the terminal downwards velocity while wall sliding
             self.velocity[1] = min(0.5, self.velocity[1])
-            self.flip = self.collisions["left"]
+            self.flip = bool(self.collisions & COLLIDE_LEFT)
             self.set_action("wall_slide")
         elif self.air_time >= 5:  # player has been in the air for 5 frames
             self.set_action("jump")
@@ -123,22 +146,24 @@ class Player(PhysicsEntity):
         else:
             self.set_action("idle")
 
+        rng = self.game.rng["effects"]
+
         # start and end of the dash
         if abs(self.dashing) in {60, 50}:
             for i in range(20):
-                particle_angle = random.random() * math.pi * 2
-                particle_speed = random.random() * 0.5 + 0.5
+                particle_angle = rng.random() * math.pi * 2
+                particle_speed = rng.random() * 0.5 + 0.5
                 particle_velocity = [
                     math.cos(particle_angle) * particle_speed,
                     math.sin(particle_angle) * particle_speed,
                 ]  # this is the correct way to spread things out in a circle shape
-                self.game.particles.append(
+                self.game.add_particle(
                     Particle(
                         self.game,
                         "particle",
                         self.rect().center,
                         particle_velocity,
-                        random.randint(0, 3),
+                        rng.randint(0, 3),
                     )
                 )
 
@@ -149,16 +174,16 @@ class Player(PhysicsEntity):
             if abs(self.dashing) == 51:
                 self.velocity[0] *= 0.1
             particle_velocity = [
-                abs(self.dashing) / self.dashing * random.random() * 3,
+                abs(self.dashing) / self.dashing * rng.random() * 3,
                 0,
             ]
-            self.game.particles.append(
+            self.game.add_particle(
                 Particle(
                     self.game,
                     "particle",
                     self.rect().center,
                     particle_velocity,
-                    random.randint(0, 3),
+                    rng.randint(0, 3),
                 )
             )
 
@@ -180,15 +205,17 @@ class Player(PhysicsEntity):
 
     def jump(self):
         if self.wall_slide:
-            self.game.sfx["jump"].play()
+            self.game.audio.play("jump")
             if self.flip and self.last_movement[0] < 0:
                 self.available_jumps -= 1
-                self.velocity = [3.5, -2.5]
+                self.velocity[0] = 3.5
+                self.velocity[1] = -2.5
                 self.air_time = 5
                 return True
             elif not self.flip and self.last_movement[0] > 0:
                 self.available_jumps -= 1
-                self.velocity = [-3.5, -2.5]
+                self.velocity[0] = -3.5
+                self.velocity[1] = -2.5
                 self.air_time = 5
                 return True
 
@@ -196,14 +223,14 @@ class Player(PhysicsEntity):
             self.available_jumps -= 1
             self.velocity[1] = -3.1
             self.air_time = 5
-            self.game.sfx["jump"].play()
+            self.game.audio.play("jump")
             return True
 
         return False
 
     def dash(self):
         if not self.dashing:
-            self.game.sfx["dash"].play()
+            self.game.audio.play("dash")
             if self.flip:
                 self.dashing = -60
             else:
@@ -211,21 +238,38 @@ class Player(PhysicsEntity):
 
 
 class Enemy(PhysicsEntity):
+    __slots__ = ("walking", "chasing")
+
     def __init__(self, game, pos, size) -> None:
         super().__init__(game, "enemy", pos, size)
 
         self.walking = 0
+        self.chasing = False  # set on the ground, the field has no cells in the air
 
     def update(self, tilemap, movement=(0, 0)):
+        rng = self.game.rng["effects"]
+
+        # the way to the player, when they are close enough to be chased
+        direction = self.game.navigation.direction(
+            (self.rect().centerx, self.pos[1] + self.size[1] - 1)
+        )
+        if self.collisions & COLLIDE_DOWN:
+            self.chasing = bool(direction)
+
         if self.walking:
+            if direction:
+                self.flip = direction[0] < 0
+                movement = (direction[0] * 0.5, movement[1])
+                # the next cell is on a higher ledge
+                if direction[1] < 0 and self.collisions & COLLIDE_DOWN:
+                    self.velocity[1] = -3.1
+            # keep going while jumping or falling toward the player
+            elif self.chasing and not self.collisions & COLLIDE_DOWN:
+                movement = (self.last_movement[0], movement[1])
             # enemy has ground in front of them AND is not facing a wall
-            if (
-                tilemap.is_solid(
-                    (self.rect().centerx + (-7 if self.flip else 7), self.pos[1] + 23)
-                )
-                and not self.collisions["left"]
-                and not self.collisions["right"]
-            ):
+            elif tilemap.is_solid(
+                (self.rect().centerx + (-7 if self.flip else 7), self.pos[1] + 23)
+            ) and not self.collisions & (COLLIDE_LEFT | COLLIDE_RIGHT):
                 movement = (-0.5 if self.flip else 0.5, movement[1])
             else:
                 self.flip = not self.flip
@@ -236,39 +280,53 @@ class Enemy(PhysicsEntity):
                     self.game.player.pos[0] - self.pos[0],
                     self.game.player.pos[1] - self.pos[1],
                 )
-                # player and enemy are roughly at the same height
-                if abs(distance_to_player[1]) < 16:
-                    # enemy is looking LEFT AND player is at the enemy's LEFT
-                    if self.flip and distance_to_player[0] < 0:
-                        self.game.projectiles.append(
-                            [[self.rect().centerx - 7, self.rect().centery], -2, 0]
+                # enemy is looking at the player
+                facing_player = (
+                    distance_to_player[0] < 0
+                    if self.flip
+                    else distance_to_player[0] > 0
+                )
+                # player and enemy are roughly at the same height AND the
+                # enemy faces them AND nothing is in between, the sight check
+                # is the slow one so it goes last
+                if (
+                    abs(distance_to_player[1]) < 16
+                    and facing_player
+                    and tilemap.in_sight(
+                        self.rect().center, self.game.player.rect().center
+                    )
+                ):
+                    # enemy is looking LEFT
+                    if self.flip:
+                        self.game.shoot(
+                            (self.rect().centerx - 7, self.rect().centery), -2
                         )
-                        self.game.sfx["shoot"].play()
+                        self.game.audio.play("shoot", self.rect().center)
                         for i in range(4):
-                            self.game.sparks.append(
+                            self.game.add_spark(
                                 Spark(
                                     self.game.projectiles[-1][0],
-                                    random.random() - 0.5 + math.pi,
-                                    random.random() + 2,
+                                    rng.random() - 0.5 + math.pi,
+                                    rng.random() + 2,
                                 )
                             )
-                    # enemy is looking RIGHT AND player is at the enemy's RIGHT
-                    elif not self.flip and distance_to_player[0] > 0:
-                        self.game.projectiles.append(
-                            [[self.rect().centerx + 7, self.rect().centery], 2, 0]
+                    # enemy is looking RIGHT
+                    else:
+                        self.game.shoot(
+                            (self.rect().centerx + 7, self.rect().centery), 2
                         )
-                        self.game.sfx["shoot"].play()
+                        self.game.audio.play("shoot", self.rect().center)
                         for i in range(4):
-                            self.game.sparks.append(
+                            self.game.add_spark(
                                 Spark(
                                     self.game.projectiles[-1][0],
-                                    random.random() - 0.5,
-                                    random.random() + 2,
+                                    rng.random() - 0.5,
+                                    rng.random() + 2,
                                 )
                             )
-        # 1% chance to start walking
-        elif random.random() < 0.01:
-            self.walking = random.randint(30, 120)
+        # 1% chance to start walking, 5% when chasing the player
+        elif self.game.rng["ai"].random() < (0.05 if direction else 0.01):
+            self.walking = self.game.rng["ai"].randint(30, 120)
 
         super().update(tilemap, movement)
 
@@ -283,18 +341,18 @@ class Enemy(PhysicsEntity):
             self.game.player.rect()
         ):
             # effects for death
-            self.game.screenshake = max(20, self.game.screenshake)
+            self.game.camera.shake(20)
             for i in range(30):
-                angle = random.random() * math.pi * 2
-                speed = random.random() * 5
-                self.game.sparks.append(
+                angle = rng.random() * math.pi * 2
+                speed = rng.random() * 5
+                self.game.add_spark(
                     Spark(
                         self.rect().center,
                         angle,
-                        random.random() + 2,
+                        rng.random() + 2,
                     )
                 )
-                self.game.particles.append(
+                self.game.add_particle(
                     Particle(
                         self.game,
                         "particle",
@@ -303,15 +361,13 @@ class Enemy(PhysicsEntity):
                             math.cos(angle + math.pi) * speed * 0.5,
                             math.sin(angle + math.pi) * speed * 0.5,
                         ],
-                        random.randint(
+                        rng.randint(
                             0, len(self.game.assets["particle/particle"].images) - 1
                         ),
                     )
                 )
-            self.game.sparks.append(Spark(self.rect().center, 0, random.random() + 4))
-            self.game.sparks.append(
-                Spark(self.rect().center, math.pi, random.random() + 4)
-            )
+            self.game.add_spark(Spark(self.rect().center, 0, rng.random() + 4))
+            self.game.add_spark(Spark(self.rect().center, math.pi, rng.random() + 4))
             return True  # the enemy will be killed
         return False
 
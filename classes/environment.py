@@ -0,0 +1,177 @@
+import math
+from multiprocessing import Pipe, Process
+
+from classes.game import Game
+from classes.replay import INPUT_REWIND
+from classes.snapshot import restore_snapshot
+from classes.tilemap import PHYSICS_TILES
+
+OBSERVATION_RADIUS = 4  # tiles around the player in every direction
+OBSERVED_ENEMIES = 8
+OBSERVED_PROJECTILES = 4
+
+REWARD_KILL = 1.0
+REWARD_LEVEL = 5.0
+REWARD_DEATH = -1.0
+REWARD_STEP = -0.001
+
+
+class Environment:
+    def __init__(self, map_name="", seed=None, max_steps=3600) -> None:
+        self.game = Game(map_name, seed, headless=True, rewind=False)
+        self.map_name = self.game.map_name
+        # episodes start from the level as it was loaded, without parsing the
+        # map again
+        self.start = self.game.level_snapshot
+        self.max_steps = max_steps
+        self.steps = 0
+
+    def reset(self):
+        restore_snapshot(self.game, self.start, rng=False)
+        self.steps = 0
+        return self.observe()
+
+    def observe(self):
+        game = self.game
+        tile_size = game.tilemap.tile_size
+        center = game.player.rect().center
+        cell = (int(center[0] // tile_size), int(center[1] // tile_size))
+
+        # solid tiles around the player, row by row
+        tiles = []
+        for y in range(cell[1] - OBSERVATION_RADIUS, cell[1] + OBSERVATION_RADIUS + 1):
+            for x in range(
+                cell[0] - OBSERVATION_RADIUS, cell[0] + OBSERVATION_RADIUS + 1
+            ):
+                key = f"{x};{y}"
+                tiles.append(
+                    int(
+                        key in game.tilemap.tilemap
+                        and game.tilemap.tilemap[key]["type"] in PHYSICS_TILES
+                    )
+                )
+
+        # the player, then the closest enemies and projectiles relative to them
+        entities = [
+            game.player.pos[0],
+            game.player.pos[1],
+            game.player.velocity[0],
+            game.player.velocity[1],
+            game.player.dashing,
+        ]
+        enemies = sorted(
+            game.enemies,
+            key=lambda enemy: math.dist(enemy.pos, game.player.pos),
+        )[:OBSERVED_ENEMIES]
+        for enemy in enemies:
+            entities += [
+                enemy.pos[0] - game.player.pos[0],
+                enemy.pos[1] - game.player.pos[1],
+                -1 if enemy.flip else 1,
+            ]
+        entities += [0, 0, 0] * (OBSERVED_ENEMIES - len(enemies))
+        projectiles = sorted(
+            game.projectiles,
+            key=lambda projectile: math.dist(projectile[0], game.player.pos),
+        )[:OBSERVED_PROJECTILES]
+        for projectile in projectiles:
+            entities += [
+                projectile[0][0] - game.player.pos[0],
+                projectile[0][1] - game.player.pos[1],
+                projectile[1],
+            ]
+        entities += [0, 0, 0] * (OBSERVED_PROJECTILES - len(projectiles))
+
+        return tiles, entities
+
+    def step(self, action):
+        enemy_count = self.game.enemy_count()
+        # rewinding would let a bot undo deaths and kills
+        self.game.step(action & ~INPUT_REWIND)
+        self.steps += 1
+
+        reward = REWARD_STEP + (enemy_count - self.game.enemy_count()) * REWARD_KILL
+        done = False
+        if self.game.dead_for:
+            reward += REWARD_DEATH
+            done = True
+        elif not self.game.enemy_count():
+            reward += REWARD_LEVEL
+            done = True
+        elif self.steps >= self.max_steps:
+            done = True
+
+        return self.observe(), reward, done
+
+
+def worker(connection, map_name, seeds, max_steps):
+    environments = [Environment(map_name, seed, max_steps) for seed in seeds]
+    while True:
+        command, actions = connection.recv()
+        if command == "reset":
+            connection.send([environment.reset() for environment in environments])
+        elif command == "step":
+            results = []
+            for environment, action in zip(environments, actions):
+                observation, reward, done = environment.step(action)
+                # finished environments start over straight away
+                if done:
+                    observation = environment.reset()
+                results.append((observation, reward, done))
+            connection.send(results)
+        elif command == "close":
+            connection.close()
+            return
+
+
+class VectorEnvironment:
+    def __init__(self, count, map_name="", seed=0, max_steps=3600, processes=4) -> None:
+        self.count = count
+        self.connections = []
+        self.processes = []
+        self.slices = []
+
+        processes = max(1, min(processes, count))
+        for i in range(processes):
+            first = count * i // processes
+            last = count * (i + 1) // processes
+            parent_connection, child_connection = Pipe()
+            process = Process(
+                target=worker,
+                args=(
+                    child_connection,
+                    map_name,
+                    [seed + j for j in range(first, last)],
+                    max_steps,
+                ),
+                daemon=True,
+            )
+            process.start()
+            self.connections.append(parent_connection)
+            self.processes.append(process)
+            self.slices.append((first, last))
+
+    def reset(self):
+        for connection in self.connections:
+            connection.send(("reset", None))
+        observations = []
+        for connection in self.connections:
+            observations += connection.recv()
+        return observations
+
+    def step(self, actions):
+        for connection, (first, last) in zip(self.connections, self.slices):
+            connection.send(("step", actions[first:last]))
+        observations, rewards, dones = [], [], []
+        for connection in self.connections:
+            for observation, reward, done in connection.recv():
+                observations.append(observation)
+                rewards.append(reward)
+                dones.append(done)
+        return observations, rewards, dones
+
+    def close(self):
+        for connection in self.connections:
+            connection.send(("close", None))
+        for process in self.processes:
+            process.join()
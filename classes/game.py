@@ -1,41 +1,130 @@
+import os
 import sys
 import math
-import random
 import pygame
 import time
+import threading
+from queue import Queue
+from collections import deque
 
-from icecream import ic
-
-from scripts.utils import load_image, load_images
+from scripts import timing
+from scripts.utils import load_image, load_images, open_data
 from classes.tilemap import Tilemap
 from classes.entities import Player, Enemy
 from classes.clouds import Clouds
+from classes.background import Background
 from classes.animations import Animation
 from classes.particle import Particle
 from classes.spark import Spark
+from classes.audio import Audio
+from classes.activation import Activation
+from classes.navigation import Navigation
+from classes.lighting import Lighting
+from classes.render_queue import RenderFrame
+from classes.camera import Camera
+from classes.rng import RNGStreams
+from classes.snapshot import SNAPSHOT_CAPACITY, take_snapshot, restore_snapshot
+from classes.replay import (
+    INPUT_LEFT,
+    INPUT_RIGHT,
+    INPUT_JUMP,
+    INPUT_DASH,
+    INPUT_REWIND,
+)
 
 PLAYER_SIZE = (8, 15)
 ENEMY_SIZE = (8, 15)
 
+EFFECT_MARGIN = 64  # effects this far outside the screen still count as visible
+EFFECT_CHUNK_SIZE = 128
+# live effects are capped, new ones past the budget are not spawned
+PARTICLE_BUDGET = 400
+SPARK_BUDGET = 200
+OFFSCREEN_UPDATE_INTERVAL = 4
+PROJECTILE_LIFETIME = 400
+# projectiles move 2px a frame and still hit walls on their last one
+PROJECTILE_RANGE = 2 * (PROJECTILE_LIFETIME + 1)
+RENDER_LAYERS = ["tiles", "entities", "projectiles", "sparks", "particles"]
+
+# name -> [path, volume, priority, plays per frame]
+# the ambience loop can never be cut off, player sounds beat enemy shots
+SFX = {
+    "ambience": ["sfx/ambience.wav", 0.2, 3, 1],
+    "dash": ["sfx/dash.wav", 0.3, 2, 1],
+    "hit": ["sfx/hit.wav", 0.8, 2, 2],
+    "jump": ["sfx/jump.wav", 0.7, 2, 1],
+    "shoot": ["sfx/shoot.wav", 0.4, 1, 2],
+}
 
-class Game:
-    def __init__(self, tilemap_name="") -> None:
-        pygame.init()
 
-        pygame.display.set_caption("my first platformer")
-        self.screen = pygame.display.set_mode((320 * 3, 240 * 3))
+class Game:
+    def __init__(
+        self,
+        tilemap_name="",
+        seed=None,
+        headless=False,
+        fast_start=False,
+        pipelined=False,
+        lighting=False,
+        screen=None,
+        level=None,
+        assets=None,
+        rewind=True,
+    ) -> None:
+        if headless:
+            # no window and no sound card, the simulation runs as fast as it can
+            os.environ["SDL_VIDEODRIVER"] = "dummy"
+            os.environ["SDL_AUDIODRIVER"] = "dummy"
+
+        # only the first game of a process is timed from the process start
+        if timing.marked("level"):
+            timing.restart("new game")
+
+        # only the subsystems the game uses
+        pygame.display.init()
+        try:
+            pygame.mixer.init()
+        except pygame.error:
+            pass  # no audio device, the game runs silent
+        timing.mark("pygame init")
+
+        # a caller that passes its own window gets it back when run returns
+        self.standalone = screen is None
+        if self.standalone:
+            pygame.display.set_caption("my first platformer")
+            self.screen = pygame.display.set_mode((320 * 3, 240 * 3))
+        else:
+            self.screen = screen
+        timing.mark("window")
         self.display = pygame.Surface((320, 240), pygame.SRCALPHA)
         self.secondary_display = pygame.Surface((320, 240))
+        # with pipelining, one frame is drawn while the next one is built
+        self.pipelined = pipelined
+        self.frames = [
+            RenderFrame(self.display.get_size(), RENDER_LAYERS) for i in range(2)
+        ]
 
         self.clock = pygame.time.Clock()
 
+        self.rng = RNGStreams(seed)
+        self.recorder = None
+        self.memory = None
+        self.capture = None
+        self.frame_count = 0
+
         self.movement = [False, False]  # left, right
+        self.rewinding = False
+        # bots and replays without rewinds don't keep the snapshot ring
+        self.rewind = rewind
+        self.snapshots = deque(maxlen=SNAPSHOT_CAPACITY)  # one per frame
 
+        # tile images the caller already loaded, like the editor's, are reused
+        assets = assets or {}
         self.assets = {
-            "decor": load_images("tiles/decor"),
-            "grass": load_images("tiles/grass"),
-            "large_decor": load_images("tiles/large_decor"),
-            "stone": load_images("tiles/stone"),
+            tile_type: assets.get(tile_type) or load_images(f"tiles/{tile_type}")
+            for tile_type in ["decor", "grass", "large_decor", "stone"]
+        }
+        self.assets |= {
             "background": load_image("background.png"),
             "clouds": load_images("clouds"),
             "player/idle": Animation(load_images("entities/player/idle"), 6),
@@ -51,50 +140,74 @@ class Game:
             "particle/particle": Animation(load_images("particles/particle"), 6, False),
         }
 
-        self.sfx = {
-            "ambience": pygame.mixer.Sound("data/sfx/ambience.wav"),
-            "dash": pygame.mixer.Sound("data/sfx/dash.wav"),
-            "hit": pygame.mixer.Sound("data/sfx/hit.wav"),
-            "jump": pygame.mixer.Sound("data/sfx/jump.wav"),
-            "shoot": pygame.mixer.Sound("data/sfx/shoot.wav"),
-        }
+        timing.mark("images")
 
-        self.sfx["ambience"].set_volume(0.2)
-        self.sfx["dash"].set_volume(0.3)
-        self.sfx["hit"].set_volume(0.8)
-        self.sfx["jump"].set_volume(0.7)
-        self.sfx["shoot"].set_volume(0.4)
+        # with a fast start, sounds are loaded after the first frame is shown
+        self.fast_start = fast_start
+        self.audio = Audio(SFX)
+        if not self.fast_start:
+            self.audio.load()
+            timing.mark("sounds")
 
-        self.clouds = Clouds(self.assets["clouds"], 16)
+        self.background = Background(
+            self.assets["background"],
+            Clouds(self.assets["clouds"], 16, self.rng["clouds"]),
+            self.secondary_display.get_size(),
+        )
 
         self.tilemap = Tilemap(self, 16)
+        self.level = level  # a tilemap played instead of the map file, if any
+        self.camera = Camera(self.display.get_size(), self.tilemap.tile_size)
+        self.activation = Activation(self, ENEMY_SIZE)
+        self.lighting = Lighting(self) if lighting else None
         if tilemap_name:
             self.map_name = tilemap_name
         else:
             self.map_name = 0
         self.load_level()
+        timing.mark("level")
 
-        self.scroll = [0, 0]
-        self.screenshake = 0
-
+        self.startup_report = False
         self.total_elapsed_time = [0, 0]
 
     def load_level(self):
-        self.tilemap.load(self.map_name)
+        if self.level is not None:
+            self.tilemap.copy_from(self.level)
+        else:
+            self.tilemap.load(self.map_name)
 
-        self.leaf_spawners = []
+        # leaf spawners are grouped in chunks so only the ones near the camera
+        # are looked at
+        self.leaf_spawners = {}
         for tree in self.tilemap.extract([("large_decor", 2)], True):
-            self.leaf_spawners.append(
-                pygame.Rect(tree["pos"][0] + 4, tree["pos"][1] + 4, 23, 13)
+            leaf_rect = pygame.Rect(tree["pos"][0] + 4, tree["pos"][1] + 4, 23, 13)
+            chunk = (
+                leaf_rect.x // EFFECT_CHUNK_SIZE,
+                leaf_rect.y // EFFECT_CHUNK_SIZE,
             )
+            self.leaf_spawners.setdefault(chunk, []).append(leaf_rect)
 
         self.player = Player(self, (0, 0), PLAYER_SIZE)
         self.enemies = []
         for spawner in self.tilemap.extract([("spawners", 0), ("spawners", 1)], False):
             if spawner["variant"] == 0:  # player
-                self.player.pos = spawner["pos"]
+                self.player.pos = list(spawner["pos"])
             else:
                 self.enemies.append(Enemy(self, spawner["pos"], ENEMY_SIZE))
+        self.activation.reset()
+        self.navigation = Navigation(self.tilemap)
+
+        # the view never scrolls past the edges of the level
+        left, top, right, bottom = self.tilemap.bounding_box()
+        tile_size = self.tilemap.tile_size
+        self.camera.bounds = pygame.Rect(
+            left * tile_size,
+            top * tile_size,
+            (right - left + 1) * tile_size,
+            (bottom - top + 1) * tile_size,
+        )
+        if self.lighting:
+            self.lighting.reset()
 
         self.projectiles = []
         self.sparks = []
@@ -104,248 +217,447 @@ class Game:
         self.dead_for = 0
         self.transition = -30
 
-    def run(self):
-        # music
-        pygame.mixer.music.load("data/music.wav")
-        pygame.mixer.music.set_volume(0.5)
-        pygame.mixer.music.play(-1)
-
-        # ambience sfx
-        self.sfx["ambience"].play(-1)
-
-        while True:
-            # calculate elapsed time per frame
-            start_time = time.time()
-
-            # level passed
-            if not len(self.enemies):
-                self.transition += 1
-                if self.transition >= 30:
-                    if type(self.map_name) == int:
-                        self.map_name += 1
-                    self.load_level()
-            if self.transition < 0:
-                self.transition += 1
-
-            # player is dead
-            if self.dead_for:
-                # player died 40 frames ago
-                self.dead_for += 1
-                if self.dead_for >= 10:
-                    self.transition = min(30, self.transition + 1)
-                if self.dead_for > 40:
-                    self.load_level()
-
-            # background
-            self.display.fill((0, 0, 0, 0))
-            self.secondary_display.blit(self.assets["background"], (0, 0))
-
-            # scroll
-            self.scroll[0] += (
-                self.player.rect().centerx
-                - self.display.get_width() / 2
-                - self.scroll[0]
-            ) / 20
-            self.scroll[1] += (
-                self.player.rect().centery
-                - self.display.get_height() / 2
-                - self.scroll[1]
-            ) / 20
-            render_scroll = (int(self.scroll[0]), int(self.scroll[1]))
-
-            # screenshake
-            self.screenshake = max(0, self.screenshake - 1)
-
-            # leaves
-            for leaf_rect in self.leaf_spawners:
-                if random.random() * 49999 < leaf_rect.width * leaf_rect.height:
+        # rewind never goes back past the level being loaded, which may have
+        # been edited since
+        self.snapshots.clear()
+
+        # respawning puts the level back the way it was loaded
+        self.level_snapshot = take_snapshot(self, effects=False)
+
+    def respawn(self):
+        # the random streams go on, so the next try plays out differently
+        restore_snapshot(self, self.level_snapshot, rng=False)
+
+    def shoot(self, pos, direction):
+        # projectiles only fly sideways through a level that doesn't change, so
+        # the border of the wall they will hit is known when they are shot
+        wall_x = None
+        # walls are checked from the first step on, like when moving
+        hit = self.tilemap.raycast(
+            (pos[0] + direction, pos[1]),
+            (pos[0] + math.copysign(PROJECTILE_RANGE, direction), pos[1]),
+        )
+        if hit:
+            wall_x = (hit[1][0] + (direction < 0)) * self.tilemap.tile_size
+        self.projectiles.append([list(pos), direction, 0, wall_x])
+
+    def add_particle(self, particle):
+        if len(self.particles) < PARTICLE_BUDGET:
+            self.particles.append(particle)
+
+    def add_spark(self, spark):
+        if len(self.sparks) < SPARK_BUDGET:
+            self.sparks.append(spark)
+
+    def enemy_count(self):
+        return len(self.enemies) + self.activation.count
+
+    def read_input(self):
+        frame_input = 0
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                self.exit()
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_ESCAPE:
+                    self.exit()
+                if event.key == pygame.K_LEFT or event.key == pygame.K_a:
+                    self.movement[0] = True
+                if event.key == pygame.K_RIGHT or event.key == pygame.K_d:
+                    self.movement[1] = True
+                if (
+                    event.key == pygame.K_UP
+                    or event.key == pygame.K_w
+                    or event.key == pygame.K_SPACE
+                ):
+                    frame_input |= INPUT_JUMP
+                if event.key == pygame.K_DOWN or event.key == pygame.K_s:
+                    pass
+                if event.key == pygame.K_x:
+                    frame_input |= INPUT_DASH
+                if event.key == pygame.K_r:
+                    self.rewinding = True
+            if event.type == pygame.KEYUP:
+                if event.key == pygame.K_LEFT or event.key == pygame.K_a:
+                    self.movement[0] = False
+                if event.key == pygame.K_RIGHT or event.key == pygame.K_d:
+                    self.movement[1] = False
+                if event.key == pygame.K_r:
+                    self.rewinding = False
+
+        if self.movement[0]:
+            frame_input |= INPUT_LEFT
+        if self.movement[1]:
+            frame_input |= INPUT_RIGHT
+        if self.rewinding:
+            frame_input |= INPUT_REWIND
+        return frame_input
+
+    def step(self, frame_input=0):
+        # rewind goes back one frame at a time instead of simulating
+        if frame_input & INPUT_REWIND:
+            if len(self.snapshots):
+                restore_snapshot(self, self.snapshots.pop())
+            return
+        if self.rewind:
+            self.snapshots.append(take_snapshot(self))
+
+        # input
+        movement = (
+            bool(frame_input & INPUT_RIGHT) - bool(frame_input & INPUT_LEFT),
+            0,
+        )
+        if frame_input & INPUT_JUMP:
+            self.player.jump()
+        if frame_input & INPUT_DASH:
+            self.do_dash = True
+
+        # level passed
+        if not self.enemy_count():
+            self.transition += 1
+            if self.transition >= 30:
+                # a play-tested level is over once it is beaten
+                if self.level is not None:
+                    self.stop()
+                if type(self.map_name) == int:
+                    self.map_name += 1
+                self.load_level()
+        if self.transition < 0:
+            self.transition += 1
+
+        # player is dead
+        if self.dead_for:
+            # player died 40 frames ago
+            self.dead_for += 1
+            if self.dead_for >= 10:
+                self.transition = min(30, self.transition + 1)
+            if self.dead_for > 40:
+                self.respawn()
+
+        # camera
+        self.camera.update(self.player.rect())
+
+        # sounds are heard from the middle of the screen
+        self.audio.update(self.camera.center())
+
+        # enemies far from the camera are put to sleep
+        self.activation.update(self.camera)
+
+        # effects are only spawned and fully simulated around the camera
+        effect_view = self.camera.rect.inflate(EFFECT_MARGIN * 2, EFFECT_MARGIN * 2)
+
+        # leaves
+        rng = self.rng["effects"]
+        for chunk in self.camera.chunks(EFFECT_CHUNK_SIZE, EFFECT_MARGIN):
+            for leaf_rect in self.leaf_spawners.get(chunk, []):
+                if len(self.particles) >= PARTICLE_BUDGET:
+                    break
+                if rng.random() * 49999 < leaf_rect.width * leaf_rect.height:
                     pos = (
-                        leaf_rect.x + random.random() * leaf_rect.width,
-                        leaf_rect.y + random.random() * leaf_rect.height,
+                        leaf_rect.x + rng.random() * leaf_rect.width,
+                        leaf_rect.y + rng.random() * leaf_rect.height,
                     )
-                    self.particles.append(
+                    self.add_particle(
                         Particle(
                             self,
                             "leaf",
                             pos,
                             [-0.1, 0.3],
-                            random.randint(
+                            rng.randint(
                                 0, len(self.assets["particle/leaf"].images) - 1
                             ),
                         )
                     )
 
-            # clouds
-            self.clouds.update()
-            self.clouds.render(self.secondary_display, render_scroll)
-
-            # tilemap
-            self.tilemap.render(self.display, render_scroll)
-
-            # player
-            if not self.dead_for:
-                self.player.update(
-                    self.tilemap, (self.movement[1] - self.movement[0], 0)
-                )
-                self.player.render(self.display, render_scroll)
-
-            # player dash
-            if self.do_dash:
-                self.do_dash = False
-                self.player.dash()
-
-            # enemies
-            for enemy in self.enemies.copy():
-                kill = enemy.update(self.tilemap, (0, 0))
-                enemy.render(self.display, render_scroll)
-                if kill:
-                    self.enemies.remove(enemy)
-
-            # projectiles
-            # projectiles are very simple so we dont need a class
-            # [[x, y], direction, timer]
-            for projectile in self.projectiles.copy():
-                projectile[0][0] += projectile[1]  # x += direction
-                projectile[2] += 1  # timer += 1
-                img = self.assets["projectile"]
-                # render
-                self.display.blit(
-                    img,
-                    (
-                        projectile[0][0] - img.get_width() / 2 - render_scroll[0],
-                        projectile[0][1] - img.get_height() / 2 - render_scroll[1],
-                    ),
-                )
-                # the projectile hits a wall
-                if self.tilemap.is_solid(projectile[0]):
-                    self.projectiles.remove(projectile)
-                    self.sfx["hit"].play()
-                    for i in range(4):
-                        self.sparks.append(
-                            Spark(
-                                projectile[0],
-                                random.random()
-                                - 0.5
-                                + (math.pi if projectile[1] > 0 else 0),
-                                random.random() + 2,
-                            )
+        # background and clouds
+        self.background.update()
+
+        # player
+        if not self.dead_for:
+            self.player.update(self.tilemap, movement)
+
+        # player dash
+        if self.do_dash:
+            self.do_dash = False
+            self.player.dash()
+
+        # enemies share one flow field toward the player
+        player_rect = self.player.rect()
+        self.navigation.update((player_rect.centerx, player_rect.bottom - 1))
+
+        # enemies
+        for enemy in self.enemies.copy():
+            kill = enemy.update(self.tilemap, (0, 0))
+            if kill:
+                self.enemies.remove(enemy)
+
+        # projectiles
+        # projectiles are very simple so we dont need a class
+        # [[x, y], direction, timer, x of the wall it will hit]
+        for projectile in self.projectiles.copy():
+            projectile[0][0] += projectile[1]  # x += direction
+            projectile[2] += 1  # timer += 1
+            # the projectile hits a wall
+            if projectile[3] is not None and (
+                projectile[0][0] >= projectile[3]
+                if projectile[1] > 0
+                else projectile[0][0] < projectile[3]
+            ):
+                self.projectiles.remove(projectile)
+                self.audio.play("hit", projectile[0])
+                for i in range(4):
+                    self.add_spark(
+                        Spark(
+                            projectile[0],
+                            rng.random() - 0.5 + (math.pi if projectile[1] > 0 else 0),
+                            rng.random() + 2,
                         )
-                # the projectile is is far away
-                if projectile[2] > 400:
-                    self.projectiles.remove(projectile)
-                # player is not dashing AND is alive AND is hit
-                elif (
-                    abs(self.player.dashing) < 50
-                    and not self.dead_for
-                    and self.player.rect().collidepoint(projectile[0])
-                ):
-                    self.sfx["hit"].play()
-                    # effects for death
-                    for i in range(30):
-                        angle = random.random() * math.pi * 2
-                        speed = random.random() * 5
-                        self.sparks.append(
-                            Spark(
-                                self.player.rect().center,
-                                angle,
-                                random.random() + 2,
-                            )
+                    )
+            # the projectile is is far away
+            if projectile[2] > PROJECTILE_LIFETIME:
+                self.projectiles.remove(projectile)
+            # player is not dashing AND is alive AND is hit
+            elif (
+                abs(self.player.dashing) < 50
+                and not self.dead_for
+                and self.player.rect().collidepoint(projectile[0])
+            ):
+                self.audio.play("hit")
+                # effects for death
+                for i in range(30):
+                    angle = rng.random() * math.pi * 2
+                    speed = rng.random() * 5
+                    self.add_spark(
+                        Spark(
+                            self.player.rect().center,
+                            angle,
+                            rng.random() + 2,
                         )
-                        self.particles.append(
-                            Particle(
-                                self,
-                                "particle",
-                                self.player.rect().center,
-                                [
-                                    math.cos(angle + math.pi) * speed * 0.5,
-                                    math.sin(angle + math.pi) * speed * 0.5,
-                                ],
-                                random.randint(
-                                    0, len(self.assets["particle/particle"].images) - 1
-                                ),
-                            )
+                    )
+                    self.add_particle(
+                        Particle(
+                            self,
+                            "particle",
+                            self.player.rect().center,
+                            [
+                                math.cos(angle + math.pi) * speed * 0.5,
+                                math.sin(angle + math.pi) * speed * 0.5,
+                            ],
+                            rng.randint(
+                                0, len(self.assets["particle/particle"].images) - 1
+                            ),
                         )
-                    self.projectiles.remove(projectile)
-                    self.dead_for += 1
-                    self.screenshake = max(20, self.screenshake)
-
-            # sparks
-            for spark in self.sparks.copy():
-                kill = spark.update()
-                spark.render(self.display, render_scroll)
-                if kill:
-                    self.sparks.remove(spark)
-
-            # outlines
-            display_mask = pygame.mask.from_surface(self.display)
-            display_silhouette = display_mask.to_surface(
-                setcolor=(0, 0, 0, 180), unsetcolor=(0, 0, 0, 0)
-            )
-            for offset in [(0, 1), (0, -1), (1, 0), (-1, 0)]:
-                self.secondary_display.blit(display_silhouette, offset)
-
-            # particles
-            for particle in self.particles.copy():
-                kill = particle.update()
-                particle.render(self.display, render_scroll)
-                if particle.type == "leaf":
-                    particle.pos[0] += math.sin(particle.animation.frame * 0.035) * 0.3
-                if kill:
-                    self.particles.remove(particle)
-
-            # events
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    self.exit()
-                if event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_ESCAPE:
-                        self.exit()
-                    if event.key == pygame.K_LEFT or event.key == pygame.K_a:
-                        self.movement[0] = True
-                    if event.key == pygame.K_RIGHT or event.key == pygame.K_d:
-                        self.movement[1] = True
-                    if (
-                        event.key == pygame.K_UP
-                        or event.key == pygame.K_w
-                        or event.key == pygame.K_SPACE
-                    ):
-                        self.player.jump()
-                    if event.key == pygame.K_DOWN or event.key == pygame.K_s:
-                        pass
-                    if event.key == pygame.K_x:
-                        self.do_dash = True
-                if event.type == pygame.KEYUP:
-                    if event.key == pygame.K_LEFT or event.key == pygame.K_a:
-                        self.movement[0] = False
-                    if event.key == pygame.K_RIGHT or event.key == pygame.K_d:
-                        self.movement[1] = False
-
-            # level transition
-            if self.transition:
-                transition_suface = pygame.Surface(self.display.get_size())
-                pygame.draw.circle(
-                    transition_suface,
-                    (255, 255, 255),
-                    (self.display.get_width() // 2, self.display.get_height() // 2),
-                    (30 - abs(self.transition)) * 8,
+                    )
+                self.projectiles.remove(projectile)
+                self.dead_for += 1
+                self.camera.shake(20)
+
+        # sparks
+        for spark in self.sparks.copy():
+            kill = spark.update()
+            if kill:
+                self.sparks.remove(spark)
+
+        # particles, the ones away from the camera are moved a few frames at a time
+        self.frame_count += 1
+        offscreen_update = self.frame_count % OFFSCREEN_UPDATE_INTERVAL == 0
+        for particle in self.particles.copy():
+            steps = 1
+            if not effect_view.collidepoint(particle.pos):
+                if not offscreen_update:
+                    continue
+                steps = OFFSCREEN_UPDATE_INTERVAL
+            kill = particle.update(steps)
+            if particle.type == "leaf":
+                particle.pos[0] += (
+                    math.sin(particle.animation.frame * 0.035) * 0.3 * steps
                 )
-                # make circle transparent
-                transition_suface.set_colorkey((255, 255, 255))
-                self.display.blit(transition_suface, (0, 0))
-
-            # join displays
-            self.secondary_display.blit(self.display, (0, 0))
-
-            # screen
-            screenshake_offset = (
-                random.random() * self.screenshake - self.screenshake / 2,
-                random.random() * self.screenshake - self.screenshake / 2,
+            if kill:
+                self.particles.remove(particle)
+
+    def build_frame(self, frame):
+        render_scroll = self.camera.render_scroll
+        frame.scroll = render_scroll
+        frame.background_time = self.background.time
+        frame.transition = self.transition
+        frame.screenshake_offset = self.camera.shake_offset(self.rng["render"])
+        if self.lighting:
+            frame.lights = self.lighting.lights(render_scroll)
+
+        # everything is queued by layer and drawn with one call per layer
+        queue = frame.queue
+
+        # tilemap
+        queue.layer = "tiles"
+        self.tilemap.render(queue, render_scroll, self.camera.tile_range)
+
+        # player
+        queue.layer = "entities"
+        if not self.dead_for:
+            self.player.render(queue, render_scroll)
+
+        # enemies
+        for enemy in self.enemies:
+            enemy.render(queue, render_scroll)
+
+        # projectiles
+        queue.layer = "projectiles"
+        img = self.assets["projectile"]
+        for projectile in self.projectiles:
+            queue.blit(
+                img,
+                (
+                    projectile[0][0] - img.get_width() / 2 - render_scroll[0],
+                    projectile[0][1] - img.get_height() / 2 - render_scroll[1],
+                ),
             )
-            self.screen.blit(
-                pygame.transform.scale(self.secondary_display, self.screen.get_size()),
-                screenshake_offset,
+
+        # sparks
+        queue.layer = "sparks"
+        for spark in self.sparks:
+            spark.render(queue, render_scroll)
+
+        # particles
+        queue.layer = "particles"
+        for particle in self.particles:
+            particle.render(queue, render_scroll)
+
+    def compose(self, frame):
+        self.display.fill((0, 0, 0, 0))
+
+        # background and clouds
+        self.background.render(
+            self.secondary_display, frame.scroll, frame.background_time
+        )
+
+        frame.queue.flush(self.display, ["tiles", "entities", "projectiles", "sparks"])
+
+        # outlines
+        display_mask = pygame.mask.from_surface(self.display)
+        display_silhouette = display_mask.to_surface(
+            setcolor=(0, 0, 0, 180), unsetcolor=(0, 0, 0, 0)
+        )
+        for offset in [(0, 1), (0, -1), (1, 0), (-1, 0)]:
+            self.secondary_display.blit(display_silhouette, offset)
+
+        # particles
+        frame.queue.flush(self.display, ["particles"])
+
+        # level transition
+        if frame.transition:
+            transition_suface = pygame.Surface(self.display.get_size())
+            pygame.draw.circle(
+                transition_suface,
+                (255, 255, 255),
+                (self.display.get_width() // 2, self.display.get_height() // 2),
+                (30 - abs(frame.transition)) * 8,
             )
-            pygame.display.update()
+            # make circle transparent
+            transition_suface.set_colorkey((255, 255, 255))
+            self.display.blit(transition_suface, (0, 0))
+
+        # join displays
+        self.secondary_display.blit(self.display, (0, 0))
+
+        # lighting
+        if self.lighting:
+            self.lighting.apply(self.secondary_display, frame.lights)
+
+        # capture, before the frame is scaled up
+        if self.capture:
+            self.capture.capture(self.secondary_display)
+
+    def present(self, image, offset):
+        # window calls stay on the main thread, SDL doesn't allow them elsewhere
+        self.screen.blit(pygame.transform.scale(image, self.screen.get_size()), offset)
+        pygame.display.update()
+
+    def render(self):
+        self.build_frame(self.frames[0])
+        self.compose(self.frames[0])
+        self.present(self.secondary_display, self.frames[0].screenshake_offset)
+
+    def start_pipeline(self):
+        self.free_frames = list(self.frames)
+        self.ready_frames = Queue()
+        self.composed_frames = Queue()
+        self.compositor = threading.Thread(target=self.compose_frames, daemon=True)
+        self.compositor.start()
+
+    def compose_frames(self):
+        # the compositor only draws off screen, the frame is shown by the main
+        # thread
+        while True:
+            frame = self.ready_frames.get()
+            if frame is None:
+                return
+            self.compose(frame)
+            frame.image.blit(self.secondary_display, (0, 0))
+            self.composed_frames.put(frame)
+
+    def present_frames(self, wait=False):
+        # shows every composed frame, waiting for one if asked to
+        while wait or not self.composed_frames.empty():
+            frame = self.composed_frames.get()
+            self.present(frame.image, frame.screenshake_offset)
+            self.free_frames.append(frame)
+            wait = False
+
+    def stop_pipeline(self):
+        self.ready_frames.put(None)
+        self.compositor.join()
+        self.present_frames()
+
+    def start_audio(self):
+        # sounds are kept when the game is run again
+        if not self.audio.sfx:
+            self.audio.load()
+        if not self.audio.enabled:
+            return
+
+        # music
+        # the file stays open for as long as the music streams from it
+        self.music_file = open_data("music.wav")
+        pygame.mixer.music.load(self.music_file)
+        pygame.mixer.music.set_volume(0.5)
+        pygame.mixer.music.play(-1)
+
+        # ambience sfx
+        self.audio.play("ambience", loops=-1)
+
+    def run(self):
+        self.running = True
+        self.movement = [False, False]
+        self.rewinding = False
+        if not self.fast_start:
+            self.start_audio()
+        if self.pipelined:
+            self.start_pipeline()
+
+        while self.running:
+            # calculate elapsed time per frame
+            start_time = time.time()
+
+            frame_input = self.read_input()
+            if self.recorder:
+                self.recorder.record(self, frame_input)
+            self.step(frame_input)
+            if self.memory:
+                self.memory.sample(self)
+            if self.pipelined:
+                # waits only if the compositor is still two frames behind
+                self.present_frames(wait=not self.free_frames)
+                frame = self.free_frames.pop()
+                self.build_frame(frame)
+                self.ready_frames.put(frame)
+            else:
+                self.render()
+
+            if not self.total_elapsed_time[1]:
+                timing.mark("first frame")
+                if self.startup_report:
+                    timing.report()
+                if self.fast_start:
+                    threading.Thread(target=self.start_audio, daemon=True).start()
 
             # time
             end_time = time.time()
@@ -356,7 +668,31 @@ class Game:
             # frame rate
             self.clock.tick(60)
 
+        if self.pipelined:
+            self.stop_pipeline()
+        if self.audio.enabled:
+            pygame.mixer.music.stop()
+            pygame.mixer.stop()
+
+    def stop(self):
+        # run returns after the current frame, pygame is left open
+        self.running = False
+
     def exit(self):
+        if not self.standalone:
+            self.stop()
+            return
+        if self.pipelined:
+            self.stop_pipeline()
+        if self.capture:
+            self.capture.close()
+        if self.recorder:
+            self.recorder.save()
+        if self.memory:
+            self.memory.close()
+        # icecream is only needed for this report, so it is imported here
+        from icecream import ic
+
         average_elapsed_time = self.total_elapsed_time[0] / self.total_elapsed_time[1]
         ic(average_elapsed_time)
         pygame.quit()
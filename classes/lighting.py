@@ -0,0 +1,179 @@
+import pygame
+from collections import deque
+
+from classes.tilemap import PHYSICS_TILES
+
+LIGHT_CHUNK_SIZE = 8  # in tiles
+LIGHT_RANGE = 6  # tiles that light from the open sky reaches around corners
+LIGHT_CACHE_SIZE = 256  # chunks
+MAX_DYNAMIC_LIGHTS = 48
+AMBIENT_COLOR = (50, 50, 80)
+SKY_COLOR = (200, 200, 220)
+
+
+def light_sprite(radius, color):
+    # a soft round light, brightest in the middle
+    sprite = pygame.Surface((radius * 2, radius * 2))
+    for r in range(radius, 0, -1):
+        strength = 1 - r / radius
+        pygame.draw.circle(
+            sprite,
+            [int(channel * strength) for channel in color],
+            (radius, radius),
+            r,
+        )
+    return sprite
+
+
+class Lighting:
+    def __init__(self, game) -> None:
+        self.game = game
+        self.light_map = pygame.Surface(game.display.get_size())
+        self.sprites = {
+            "spark": light_sprite(12, (120, 110, 90)),
+            "projectile": light_sprite(20, (160, 80, 40)),
+            "dash": light_sprite(48, (60, 90, 140)),
+        }
+        self.chunks = {}  # chunk -> light image
+        self.tops = {}  # x -> y of the highest solid tile of the column
+        self.bottom = 0
+        game.tilemap.listeners.append(self.tile_changed)
+
+    def reset(self):
+        # the sky reaches down every column to its highest solid tile
+        self.chunks = {}
+        self.tops = {}
+        self.bottom = 0
+        for tile in self.game.tilemap.tilemap.values():
+            if tile["type"] in PHYSICS_TILES:
+                x, y = int(tile["pos"][0]), int(tile["pos"][1])
+                if x not in self.tops or y < self.tops[x]:
+                    self.tops[x] = y
+                self.bottom = max(self.bottom, y)
+
+    def is_solid(self, x, y):
+        key = f"{x};{y}"
+        tilemap = self.game.tilemap.tilemap
+        return key in tilemap and tilemap[key]["type"] in PHYSICS_TILES
+
+    def tile_changed(self, pos):
+        x, y = int(pos[0]), int(pos[1])
+        if self.is_solid(x, y):
+            if x not in self.tops or y < self.tops[x]:
+                self.tops[x] = y
+            self.bottom = max(self.bottom, y)
+        elif self.tops.get(x) == y:
+            del self.tops[x]
+            for below in range(y + 1, self.bottom + 1):
+                if self.is_solid(x, below):
+                    self.tops[x] = below
+                    break
+
+        # everything under the tile may see more or less sky now
+        left = (x - LIGHT_RANGE) // LIGHT_CHUNK_SIZE
+        right = (x + LIGHT_RANGE) // LIGHT_CHUNK_SIZE
+        top = (y - LIGHT_RANGE) // LIGHT_CHUNK_SIZE
+        for chunk in list(self.chunks):
+            if left <= chunk[0] <= right and chunk[1] >= top:
+                del self.chunks[chunk]
+
+    def build_chunk(self, chunk):
+        # light spreads from the open sky through empty cells and fades with
+        # every step, a border is worked out too so chunks join up
+        border = LIGHT_RANGE + 1
+        left = chunk[0] * LIGHT_CHUNK_SIZE - border
+        top = chunk[1] * LIGHT_CHUNK_SIZE - border
+        span = LIGHT_CHUNK_SIZE + border * 2
+
+        levels = {}
+        queue = deque()
+        for x in range(left, left + span):
+            sky_end = self.tops.get(x, top + span)
+            for y in range(top, min(sky_end, top + span)):
+                levels[(x, y)] = LIGHT_RANGE
+                queue.append((x, y))
+        while queue:
+            x, y = queue.popleft()
+            level = levels[(x, y)] - 1
+            if level <= 0:
+                continue
+            for cell in [(x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)]:
+                if cell in levels:
+                    continue
+                if not (left <= cell[0] < left + span and top <= cell[1] < top + span):
+                    continue
+                # solid tiles are lit on their face but stop the light
+                levels[cell] = level
+                if not self.is_solid(cell[0], cell[1]):
+                    queue.append(cell)
+
+        # one pixel per cell, smoothly scaled up to the tiles
+        cells = pygame.Surface((LIGHT_CHUNK_SIZE + 2, LIGHT_CHUNK_SIZE + 2))
+        for x in range(LIGHT_CHUNK_SIZE + 2):
+            for y in range(LIGHT_CHUNK_SIZE + 2):
+                level = levels.get((left + border - 1 + x, top + border - 1 + y), 0)
+                cells.set_at(
+                    (x, y),
+                    [int(channel * level / LIGHT_RANGE) for channel in SKY_COLOR],
+                )
+        tile_size = self.game.tilemap.tile_size
+        scaled = pygame.transform.smoothscale(
+            cells,
+            ((LIGHT_CHUNK_SIZE + 2) * tile_size, (LIGHT_CHUNK_SIZE + 2) * tile_size),
+        )
+        return scaled.subsurface(
+            (
+                tile_size,
+                tile_size,
+                LIGHT_CHUNK_SIZE * tile_size,
+                LIGHT_CHUNK_SIZE * tile_size,
+            )
+        ).copy()
+
+    def lights(self, render_scroll):
+        # blits for the light map of one frame: the cached chunks on screen
+        # and a capped number of light sprites
+        game = self.game
+        chunk_size = LIGHT_CHUNK_SIZE * game.tilemap.tile_size
+        blits = []
+        for chunk in game.camera.chunks(chunk_size):
+            if chunk not in self.chunks:
+                if len(self.chunks) >= LIGHT_CACHE_SIZE:
+                    self.chunks = {}
+                self.chunks[chunk] = self.build_chunk(chunk)
+            blits.append(
+                (
+                    self.chunks[chunk],
+                    (
+                        chunk[0] * chunk_size - render_scroll[0],
+                        chunk[1] * chunk_size - render_scroll[1],
+                    ),
+                    None,
+                    pygame.BLEND_RGB_MAX,
+                )
+            )
+
+        sources = []
+        if abs(game.player.dashing) > 50:
+            sources.append(("dash", game.player.rect().center))
+        sources += [("projectile", projectile[0]) for projectile in game.projectiles]
+        sources += [("spark", spark.pos) for spark in game.sparks]
+        for name, pos in sources[:MAX_DYNAMIC_LIGHTS]:
+            sprite = self.sprites[name]
+            blits.append(
+                (
+                    sprite,
+                    (
+                        pos[0] - sprite.get_width() // 2 - render_scroll[0],
+                        pos[1] - sprite.get_height() // 2 - render_scroll[1],
+                    ),
+                    None,
+                    pygame.BLEND_RGB_ADD,
+                )
+            )
+        return blits
+
+    def apply(self, surface, blits):
+        self.light_map.fill(AMBIENT_COLOR)
+        self.light_map.blits(blits, False)
+        surface.blit(self.light_map, (0, 0), special_flags=pygame.BLEND_RGB_MULT)
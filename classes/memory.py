@@ -0,0 +1,106 @@
+import os
+import json
+import time
+import tracemalloc
+
+import pygame
+
+from classes.animations import Animation
+
+TRACEBACK_DEPTH = 4  # deeper tracebacks make every allocation much slower
+SNAPSHOT_INTERVAL = 600  # frames between tracemalloc snapshots
+PROJECT_DIRS = ("classes", "scripts")
+
+
+def subsystem_of(traceback):
+    # the newest frame of the game's own code made the allocation, so its
+    # module names the subsystem (json decoding in tilemap.load is "tilemap")
+    for frame in reversed(traceback):
+        directory, filename = os.path.split(frame.filename)
+        if os.path.basename(directory) in PROJECT_DIRS:
+            return os.path.splitext(filename)[0]
+        if filename == "main.py":
+            return "main"
+    return "other"
+
+
+def surface_size(surface):
+    return surface.get_width() * surface.get_height() * surface.get_bytesize()
+
+
+def asset_memory(assets):
+    # surfaces live in SDL's memory, which tracemalloc can't see
+    sizes = {}
+    for name, asset in assets.items():
+        if isinstance(asset, pygame.Surface):
+            surfaces = [asset]
+        elif isinstance(asset, Animation):
+            surfaces = list(asset.images) + list(asset.flipped_frames)
+        else:
+            surfaces = list(asset)
+        # frames repeat the same few images, each one is only counted once
+        unique = {id(surface): surface for surface in surfaces}
+        sizes[name] = sum(surface_size(surface) for surface in unique.values())
+    return sizes
+
+
+class MemoryMonitor:
+    def __init__(self, path, snapshot_interval=SNAPSHOT_INTERVAL) -> None:
+        self.path = path
+        self.snapshot_interval = snapshot_interval
+        self.frame = 0
+        self.start_time = time.time()
+        # started before the game is made, so loading is traced too
+        tracemalloc.start(TRACEBACK_DEPTH)
+        self.file = open(path, "w")
+
+    def write(self, entry):
+        self.file.write(json.dumps(entry) + "\n")
+
+    def subsystems(self):
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, tracemalloc.__file__)]
+        )
+        sizes = {}
+        for stat in snapshot.statistics("traceback"):
+            name = subsystem_of(stat.traceback)
+            sizes[name] = sizes.get(name, 0) + stat.size
+        return dict(sorted(sizes.items(), key=lambda x: -x[1]))
+
+    def sample(self, game):
+        if not self.frame:
+            surfaces = asset_memory(game.assets)
+            self.write({"frame": 0, "surfaces": surfaces})
+
+        # the live objects are counted every frame
+        current, peak = tracemalloc.get_traced_memory()
+        entry = {
+            "frame": self.frame,
+            "time": round(time.time() - self.start_time, 3),
+            "traced": current,
+            "peak": peak,
+            "counts": {
+                "particles": len(game.particles),
+                "sparks": len(game.sparks),
+                "enemies": len(game.enemies),
+                "sleeping_enemies": game.activation.count,
+                "projectiles": len(game.projectiles),
+                "tiles": len(game.tilemap.tilemap),
+                "offgrid_tiles": len(game.tilemap.offgrid_tiles),
+                "snapshots": len(game.snapshots),
+            },
+        }
+        if self.frame % self.snapshot_interval == 0:
+            entry["subsystems"] = self.subsystems()
+        self.write(entry)
+        self.frame += 1
+
+    def close(self):
+        subsystems = self.subsystems()
+        self.write({"frame": self.frame, "subsystems": subsystems})
+        self.file.close()
+        tracemalloc.stop()
+
+        print(f"Memory timeline written to {self.path}, traced memory by subsystem:")
+        for name, size in list(subsystems.items())[:10]:
+            print(f"    {name:<16}{size / 1024:10.1f} KiB")
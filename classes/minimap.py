@@ -0,0 +1,107 @@
+import pygame
+
+MINIMAP_CHUNK_SIZE = 32  # in tiles
+CHUNK_BUILDS_PER_FRAME = 16  # the rest show up over the next frames
+
+
+def average_color(img):
+    # the see-through pixels are black, so they only dilute the average
+    count = pygame.mask.from_surface(img).count()
+    if not count:
+        return (0, 0, 0, 0)
+    scale = img.get_width() * img.get_height() / count
+    color = pygame.transform.average_color(img)
+    return tuple(min(int(channel * scale), 255) for channel in color[:3]) + (255,)
+
+
+def tile_colors(assets, tile_types):
+    # each tile is drawn as the average color of its image
+    return {
+        tile_type: [average_color(img) for img in assets[tile_type]]
+        for tile_type in tile_types
+    }
+
+
+class Minimap:
+    # the tilemap a few pixels per tile, kept in chunks that are drawn once and
+    # then only changed where tiles are edited
+    def __init__(self, tilemap, colors, scale=1) -> None:
+        self.tilemap = tilemap
+        self.colors = colors
+        self.scale = scale  # pixels per tile
+        self.chunks = {}  # chunk -> image
+        tilemap.listeners.append(self.tile_changed)
+
+    def reset(self):
+        self.chunks = {}
+
+    def tile_color(self, x, y):
+        tile = self.tilemap.tilemap.get(f"{x};{y}")
+        if tile and tile["type"] in self.colors:
+            variants = self.colors[tile["type"]]
+            return variants[tile["variant"] % len(variants)]
+        return (0, 0, 0, 0)
+
+    def tile_changed(self, pos):
+        x, y = int(pos[0]), int(pos[1])
+        chunk = (x // MINIMAP_CHUNK_SIZE, y // MINIMAP_CHUNK_SIZE)
+        if chunk in self.chunks:
+            self.chunks[chunk].fill(
+                self.tile_color(x, y),
+                (
+                    (x - chunk[0] * MINIMAP_CHUNK_SIZE) * self.scale,
+                    (y - chunk[1] * MINIMAP_CHUNK_SIZE) * self.scale,
+                    self.scale,
+                    self.scale,
+                ),
+            )
+
+    def build_chunk(self, chunk):
+        size = MINIMAP_CHUNK_SIZE * self.scale
+        img = pygame.Surface((size, size), pygame.SRCALPHA)
+        left = chunk[0] * MINIMAP_CHUNK_SIZE
+        top = chunk[1] * MINIMAP_CHUNK_SIZE
+        for x in range(MINIMAP_CHUNK_SIZE):
+            for y in range(MINIMAP_CHUNK_SIZE):
+                color = self.tile_color(left + x, top + y)
+                if color[3]:
+                    img.fill(
+                        color,
+                        (x * self.scale, y * self.scale, self.scale, self.scale),
+                    )
+        return img
+
+    def render(self, surface, rect, origin):
+        # draws into rect of the surface, with the tile at origin in its corner
+        rect = pygame.Rect(rect)
+        chunk_size = MINIMAP_CHUNK_SIZE * self.scale
+        offset = (
+            int(origin[0] * self.scale) - rect.x,
+            int(origin[1] * self.scale) - rect.y,
+        )
+        builds = CHUNK_BUILDS_PER_FRAME
+        blits = []
+        for x in range(
+            (offset[0] + rect.x) // chunk_size,
+            (offset[0] + rect.right - 1) // chunk_size + 1,
+        ):
+            for y in range(
+                (offset[1] + rect.y) // chunk_size,
+                (offset[1] + rect.bottom - 1) // chunk_size + 1,
+            ):
+                if (x, y) not in self.chunks:
+                    if not builds:
+                        continue
+                    builds -= 1
+                    self.chunks[(x, y)] = self.build_chunk((x, y))
+                blits.append(
+                    (
+                        self.chunks[(x, y)],
+                        (x * chunk_size - offset[0], y * chunk_size - offset[1]),
+                    )
+                )
+
+        clip = surface.get_clip()
+        surface.set_clip(rect)
+        surface.blits(blits, False)
+        surface.set_clip(clip)
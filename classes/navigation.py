@@ -0,0 +1,110 @@
+from collections import deque
+
+from classes.tilemap import PHYSICS_TILES
+
+JUMP_HEIGHT = 2  # in tiles, an enemy jump reaches about 3
+MAX_DROP = 16  # deeper falls are not worth following
+FLOW_RADIUS = 64  # enemies further away than this many steps don't chase
+GOAL_SEARCH_DEPTH = 8  # how far under a jumping player their ground is looked for
+
+
+def solid_cells(tilemap):
+    return {
+        (int(tile["pos"][0]), int(tile["pos"][1]))
+        for tile in tilemap.tilemap.values()
+        if tile["type"] in PHYSICS_TILES
+    }
+
+
+def walkable_cells(solid):
+    # every empty cell standing on a solid tile can be walked on
+    return {(x, y - 1) for x, y in solid if (x, y - 1) not in solid}
+
+
+def walk_graph(tilemap):
+    # the cells that can be walked on, and for each of them the cells that can
+    # walk, fall or jump onto it
+    solid = solid_cells(tilemap)
+    walkable = walkable_cells(solid)
+
+    # the field is searched from the goal, so links are stored backwards
+    links_to = {cell: [] for cell in walkable}
+    for x, y in walkable:
+        for side in [-1, 1]:
+            # walk
+            if (x + side, y) in walkable:
+                links_to[(x + side, y)].append((x, y))
+                continue
+
+            # walk off the ledge and fall
+            if (x + side, y) not in solid:
+                for depth in range(y + 1, y + MAX_DROP):
+                    if (x + side, depth) in solid:
+                        links_to[(x + side, depth - 1)].append((x, y))
+                        break
+
+            # jump onto a higher ledge, with nothing above the head
+            for height in range(1, JUMP_HEIGHT + 1):
+                if (x, y - height) in solid:
+                    break
+                if (x + side, y - height) in walkable:
+                    links_to[(x + side, y - height)].append((x, y))
+                    break
+
+    return walkable, links_to
+
+
+def ground_cell(walkable, cell):
+    # the walkable cell at or a little under cell, or None
+    for i in range(GOAL_SEARCH_DEPTH):
+        if cell in walkable:
+            return cell
+        cell = (cell[0], cell[1] + 1)
+    return None
+
+
+class Navigation:
+    def __init__(self, tilemap) -> None:
+        self.tilemap = tilemap
+        self.goal = None
+        self.flow = {}  # cell -> next cell toward the goal
+        self.build()
+
+    def build(self):
+        self.tile_size = self.tilemap.tile_size
+        self.walkable, self.links_to = walk_graph(self.tilemap)
+        self.goal = None
+        self.flow = {}
+
+    def cell(self, pos):
+        return (int(pos[0] // self.tile_size), int(pos[1] // self.tile_size))
+
+    def update(self, target):
+        # the goal is the ground the target stands on, or lands on
+        goal = ground_cell(self.walkable, self.cell(target))
+        if goal is None:
+            return
+
+        # the same field is shared by every enemy until the target changes cell
+        if goal == self.goal:
+            return
+        self.goal = goal
+
+        self.flow = {goal: goal}
+        queue = deque([(goal, 0)])
+        while queue:
+            cell, distance = queue.popleft()
+            if distance >= FLOW_RADIUS:
+                continue
+            for source in self.links_to[cell]:
+                if source not in self.flow:
+                    self.flow[source] = cell
+                    queue.append((source, distance + 1))
+
+    def direction(self, pos):
+        # (dx, dy) in cells toward the goal, or None when there is no way there
+        cell = self.cell(pos)
+        if cell not in self.flow or cell == self.goal:
+            return None
+        next_cell = self.flow[cell]
+        return (next_cell[0] - cell[0], next_cell[1] - cell[1])
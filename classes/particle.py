@@ -1,24 +1,22 @@
-from icecream import ic
-
-
 class Particle:
+    __slots__ = ("game", "type", "pos", "velocity", "animation")
+
     def __init__(self, game, p_type, pos, velocity=[0, 0], frame=0) -> None:
         self.game = game
         self.type = p_type
         self.pos = list(pos)
         self.velocity = list(velocity)
-        self.animation = self.game.assets[f"particle/{self.type}"].copy()
-        self.animation.frame = frame
+        self.animation = self.game.assets[f"particle/{self.type}"].cursor(frame)
 
-    def update(self):
+    def update(self, steps=1):
         kill = False
         if self.animation.done:
             kill = True
 
-        self.pos[0] += self.velocity[0]
-        self.pos[1] += self.velocity[1]
+        self.pos[0] += self.velocity[0] * steps
+        self.pos[1] += self.velocity[1] * steps
 
-        self.animation.update()
+        self.animation.update(steps)
 
         return kill
 
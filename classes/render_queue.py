@@ -0,0 +1,70 @@
+import pygame
+
+
+class RenderQueue:
+    def __init__(self, size, layers) -> None:
+        self.size = size
+        self.layers = {layer: ([], []) for layer in layers}  # layer -> blits, polygons
+        self.layer = layers[0]
+
+    # renderers only call blit and blits, so the queue can stand in for a surface
+    def get_width(self):
+        return self.size[0]
+
+    def get_height(self):
+        return self.size[1]
+
+    def get_size(self):
+        return self.size
+
+    def visible(self, img, pos):
+        return (
+            pos[0] < self.size[0]
+            and pos[1] < self.size[1]
+            and pos[0] + img.get_width() > 0
+            and pos[1] + img.get_height() > 0
+        )
+
+    def blit(self, img, pos):
+        if self.visible(img, pos):
+            self.layers[self.layer][0].append((img, pos))
+
+    def blits(self, blit_sequence, doreturn=False):
+        self.layers[self.layer][0].extend(
+            (img, pos) for img, pos in blit_sequence if self.visible(img, pos)
+        )
+
+    def polygon(self, color, points):
+        if (
+            min(point[0] for point in points) < self.size[0]
+            and min(point[1] for point in points) < self.size[1]
+            and max(point[0] for point in points) > 0
+            and max(point[1] for point in points) > 0
+        ):
+            self.layers[self.layer][1].append((color, points))
+
+    def flush(self, surface, layers):
+        # one call into pygame per layer instead of one per image
+        for layer in layers:
+            blits, polygons = self.layers[layer]
+            if hasattr(surface, "fblits"):
+                surface.fblits(blits)
+            else:
+                surface.blits(blits, False)
+            for color, points in polygons:
+                pygame.draw.polygon(surface, color, points)
+            blits.clear()
+            polygons.clear()
+
+
+class RenderFrame:
+    # everything needed to draw one frame, so it can be drawn while the next
+    # frame is simulated
+    def __init__(self, size, layers) -> None:
+        self.queue = RenderQueue(size, layers)
+        self.scroll = (0, 0)
+        self.background_time = 0
+        self.transition = 0
+        self.screenshake_offset = (0, 0)
+        self.lights = []  # blits for the light map
+        self.image = pygame.Surface(size)  # the composed frame, when pipelined
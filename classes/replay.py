@@ -0,0 +1,142 @@
+import json
+import time
+import zlib
+import struct
+import hashlib
+
+INPUT_LEFT = 1
+INPUT_RIGHT = 2
+INPUT_JUMP = 4
+INPUT_DASH = 8
+INPUT_REWIND = 16
+
+REPLAY_MAGIC = b"MFPR"
+REPLAY_VERSION = 1
+CHECKPOINT_INTERVAL = 60
+
+
+def state_hash(game):
+    # everything that decides how the level plays out, but no cosmetic effects
+    state = [
+        game.map_name,
+        game.transition,
+        game.dead_for,
+        game.camera.scroll,
+        game.player.pos,
+        game.player.velocity,
+        game.player.dashing,
+        game.player.air_time,
+        [
+            (enemy.pos, enemy.velocity, enemy.walking, enemy.flip)
+            for enemy in game.enemies
+        ],
+        game.activation.sleeping,
+        game.projectiles,
+    ]
+    return hashlib.blake2b(repr(state).encode(), digest_size=8).digest()
+
+
+class InputRecorder:
+    def __init__(self, path, game, checkpoint_interval=CHECKPOINT_INTERVAL) -> None:
+        self.path = path
+        self.seed = game.rng.seed
+        self.map_name = game.map_name
+        self.checkpoint_interval = checkpoint_interval
+        self.inputs = bytearray()
+        self.checkpoints = []  # [(frame, state hash)]
+
+    def record(self, game, frame_input):
+        # checkpoints hash the state before the frame's input is applied
+        if len(self.inputs) % self.checkpoint_interval == 0:
+            self.checkpoints.append((len(self.inputs), state_hash(game)))
+        self.inputs.append(frame_input)
+
+    def save(self):
+        map_name = json.dumps(self.map_name).encode()
+        inputs = zlib.compress(bytes(self.inputs), 9)
+        with open(self.path, "wb") as file:
+            file.write(
+                struct.pack(
+                    "<4sBQHII",
+                    REPLAY_MAGIC,
+                    REPLAY_VERSION,
+                    self.seed,
+                    len(map_name),
+                    len(inputs),
+                    len(self.checkpoints),
+                )
+            )
+            file.write(map_name)
+            file.write(inputs)
+            for frame, digest in self.checkpoints:
+                file.write(struct.pack("<I", frame) + digest)
+
+
+class Replay:
+    def __init__(self, seed, map_name, inputs, checkpoints) -> None:
+        self.seed = seed
+        self.map_name = map_name
+        self.inputs = inputs
+        self.checkpoints = checkpoints
+
+    @staticmethod
+    def load(path):
+        with open(path, "rb") as file:
+            data = file.read()
+
+        header = struct.Struct("<4sBQHII")
+        magic, version, seed, map_size, inputs_size, checkpoint_count = (
+            header.unpack_from(data)
+        )
+        if magic != REPLAY_MAGIC or version != REPLAY_VERSION:
+            raise ValueError(f"{path} is not a version {REPLAY_VERSION} replay")
+
+        offset = header.size
+        map_name = json.loads(data[offset : offset + map_size])
+        offset += map_size
+        inputs = zlib.decompress(data[offset : offset + inputs_size])
+        offset += inputs_size
+        checkpoints = {}
+        for i in range(checkpoint_count):
+            frame = struct.unpack_from("<I", data, offset)[0]
+            checkpoints[frame] = data[offset + 4 : offset + 12]
+            offset += 12
+
+        return Replay(seed, map_name, inputs, checkpoints)
+
+    def run(self, capture_path=None):
+        # imported here because the game imports the input flags from this module
+        from classes.game import Game
+        from classes.capture import FrameCapture
+
+        # the snapshot ring is only kept when the replay rewinds
+        rewind = any(frame_input & INPUT_REWIND for frame_input in self.inputs)
+        game = Game(self.map_name, self.seed, headless=True, rewind=rewind)
+        # frames are only drawn when they are captured
+        if capture_path:
+            game.capture = FrameCapture(capture_path, game.secondary_display)
+
+        mismatches = []
+        start_time = time.time()
+        for frame, frame_input in enumerate(self.inputs):
+            if (
+                frame in self.checkpoints
+                and state_hash(game) != self.checkpoints[frame]
+            ):
+                mismatches.append(frame)
+            game.step(frame_input)
+            if game.capture:
+                game.render()
+        elapsed_time = time.time() - start_time
+        if game.capture:
+            game.capture.close()
+
+        print(
+            f"Replayed {len(self.inputs)} frames in {elapsed_time:.2f}s "
+            f"({len(self.inputs) / max(elapsed_time, 1e-9):.0f} frames/s), "
+            f"{len(self.checkpoints) - len(mismatches)}/{len(self.checkpoints)} "
+            "checkpoints matched."
+        )
+        if mismatches:
+            print(f"First desync at frame {mismatches[0]}.")
+        return mismatches
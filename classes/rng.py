@@ -0,0 +1,35 @@
+import random
+from array import array
+
+
+class RNGStreams:
+    def __init__(self, seed=None) -> None:
+        if seed is None:
+            seed = random.getrandbits(32)
+        self.seed = seed
+        self.streams = {}
+
+    def __getitem__(self, name):
+        # every subsystem draws from its own stream, so cosmetic randomness
+        # (effects, clouds, screenshake) never changes the simulation
+        if name not in self.streams:
+            self.streams[name] = random.Random(f"{self.seed}:{name}")
+        return self.streams[name]
+
+    def getstate(self, names=None):
+        # the 625 numbers of a stream's state are kept as raw bytes, which is
+        # much smaller and quicker to copy around than a tuple of ints
+        if names is None:
+            names = list(self.streams)
+        state = {}
+        for name in names:
+            version, internal_state, gauss_next = self[name].getstate()
+            state[name] = (version, array("I", internal_state).tobytes(), gauss_next)
+        return state
+
+    def setstate(self, state):
+        # streams missing from the state are left as they are
+        for name, (version, internal_state, gauss_next) in state.items():
+            self[name].setstate(
+                (version, tuple(array("I", internal_state)), gauss_next)
+            )
@@ -0,0 +1,145 @@
+import pickle
+
+from classes.entities import Enemy
+from classes.particle import Particle
+from classes.spark import Spark
+
+SNAPSHOT_CAPACITY = 600  # ten seconds of rewind at 60 frames a second
+# the streams the simulation draws from, clouds are only used when the game is
+# made and the render stream only shakes the screen
+SNAPSHOT_STREAMS = ["ai", "effects"]
+
+
+def entity_state(entity):
+    return (
+        tuple(entity.pos),
+        tuple(entity.velocity),
+        tuple(entity.last_movement),
+        entity.collisions,
+        entity.flip,
+        entity.action,
+        entity.animation.frame,
+        entity.animation.done,
+    )
+
+
+def restore_entity(entity, state):
+    entity.pos = list(state[0])
+    entity.velocity = list(state[1])
+    entity.last_movement = list(state[2])
+    entity.collisions = state[3]
+    entity.flip = state[4]
+    entity.set_action(state[5])
+    entity.animation.frame = state[6]
+    entity.animation.done = state[7]
+
+
+def take_snapshot(game, effects=True):
+    effect_state = None
+    if effects:
+        effect_state = (
+            [(tuple(spark.pos), spark.angle, spark.speed) for spark in game.sparks],
+            [
+                (
+                    particle.type,
+                    tuple(particle.pos),
+                    tuple(particle.velocity),
+                    particle.animation.frame,
+                    particle.animation.done,
+                )
+                for particle in game.particles
+            ],
+        )
+
+    # snapshots only hold plain values, so pickling them is quick and the blob
+    # shares nothing with the live game
+    player = game.player
+    state = (
+        game.map_name,
+        game.transition,
+        game.dead_for,
+        game.do_dash,
+        tuple(game.camera.scroll),
+        game.camera.screenshake,
+        game.background.time,
+        game.rng.getstate(SNAPSHOT_STREAMS),
+        entity_state(player)
+        + (player.air_time, player.available_jumps, player.wall_slide, player.dashing),
+        [
+            entity_state(enemy) + (enemy.size, enemy.walking, enemy.chasing)
+            for enemy in game.enemies
+        ],
+        game.activation.sleeping,
+        game.activation.count,
+        [
+            (tuple(projectile[0]), projectile[1], projectile[2], projectile[3])
+            for projectile in game.projectiles
+        ],
+        effect_state,
+    )
+    return pickle.dumps(state, pickle.HIGHEST_PROTOCOL)
+
+
+def restore_snapshot(game, snapshot, rng=True):
+    (
+        map_name,
+        transition,
+        dead_for,
+        do_dash,
+        scroll,
+        screenshake,
+        background_time,
+        rng_state,
+        player_state,
+        enemy_states,
+        sleeping,
+        sleeping_count,
+        projectiles,
+        effects,
+    ) = pickle.loads(snapshot)
+
+    if map_name != game.map_name:
+        game.map_name = map_name
+        game.load_level()
+
+    game.transition = transition
+    game.dead_for = dead_for
+    game.do_dash = do_dash
+    game.camera.scroll = list(scroll)
+    game.camera.screenshake = screenshake
+    game.camera.update_view()
+    game.background.time = background_time
+    if rng:
+        game.rng.setstate(rng_state)
+
+    restore_entity(game.player, player_state)
+    (
+        game.player.air_time,
+        game.player.available_jumps,
+        game.player.wall_slide,
+        game.player.dashing,
+    ) = player_state[8:]
+
+    game.enemies = []
+    for state in enemy_states:
+        enemy = Enemy(game, state[0], state[8])
+        restore_entity(enemy, state)
+        enemy.walking = state[9]
+        enemy.chasing = state[10]
+        game.enemies.append(enemy)
+    game.activation.sleeping = sleeping
+    game.activation.count = sleeping_count
+
+    game.projectiles = [
+        [list(pos), direction, timer, wall_x]
+        for pos, direction, timer, wall_x in projectiles
+    ]
+
+    game.sparks = []
+    game.particles = []
+    if effects:
+        game.sparks = [Spark(pos, angle, speed) for pos, angle, speed in effects[0]]
+        for p_type, pos, velocity, frame, done in effects[1]:
+            particle = Particle(game, p_type, pos, velocity, frame)
+            particle.animation.done = done
+            game.particles.append(particle)
@@ -49,4 +49,8 @@ class Spark:
             ),
         ]
 
-        pygame.draw.polygon(surface, (255, 255, 255), vertices)
+        # the render queue batches polygons, a plain surface is drawn on now
+        if isinstance(surface, pygame.Surface):
+            pygame.draw.polygon(surface, (255, 255, 255), vertices)
+        else:
+            surface.polygon((255, 255, 255), vertices)
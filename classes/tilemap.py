@@ -1,9 +1,9 @@
 import os
+import math
 import pygame
 import json
 
-from icecream import ic
-
+from scripts.utils import read_data
 
 NEIGHBOR_OFFSETS = [
     (-1, -1),
@@ -30,6 +30,25 @@ AUTOTILE_MAP = {
     tuple(sorted([(0, -1), (1, 0), (0, 1), (-1, 0)])): 8,
 }
 BASE_MAP_PATH = "data/maps/"
+SIGHT_CACHE_SIZE = 4096
+OFFGRID_CHUNK_SIZE = 128  # in pixels
+OFFGRID_MARGIN = 64  # offgrid images are smaller than this
+
+
+def write_map(map_name, data):
+    # the map is written next to the old one and swapped in at once, so a
+    # crash halfway through never leaves a broken file behind
+    path = os.path.join(BASE_MAP_PATH, f"{map_name}.json")
+    temp_path = f"{path}.tmp"
+    try:
+        with open(temp_path, "w") as file:
+            json.dump(data, file)
+        os.replace(temp_path, path)
+    except BaseException:
+        # a half written file is not left lying next to the map
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
 
 
 class Tilemap:
@@ -38,28 +57,142 @@ class Tilemap:
         self.tile_size = tile_size
         self.tilemap = {}
         self.offgrid_tiles = []
+        self.sight_cache = {}  # (cell, cell) -> nothing solid in between
+        self.cell_rects = {}  # key -> rect of the cell, made once
+        self.listeners = []  # called with the position of every changed tile
+
+        # tiles by (type, variant), so finding some kind of tile never scans
+        # the whole map
+        self.grid_index = {}  # (type, variant) -> {key: tile}
+        self.offgrid_index = {}  # (type, variant) -> [tile]
+        # offgrid tiles by the chunk they are in, so rendering only walks the
+        # chunks on screen
+        self.offgrid_chunks = {}  # chunk -> [tile]
+
+    def offgrid_chunk(self, pos):
+        return (int(pos[0] // OFFGRID_CHUNK_SIZE), int(pos[1] // OFFGRID_CHUNK_SIZE))
+
+    def reindex(self):
+        self.grid_index = {}
+        for key, tile in self.tilemap.items():
+            self.grid_index.setdefault((tile["type"], tile["variant"]), {})[key] = tile
+        self.offgrid_index = {}
+        self.offgrid_chunks = {}
+        for tile in self.offgrid_tiles:
+            self.offgrid_index.setdefault((tile["type"], tile["variant"]), []).append(
+                tile
+            )
+            self.offgrid_chunks.setdefault(self.offgrid_chunk(tile["pos"]), []).append(
+                tile
+            )
+
+    def set_tile(self, pos, tile_type, variant=0):
+        # returns the new tile, or None when the same tile was already there
+        key = f"{pos[0]};{pos[1]}"
+        if key in self.tilemap:
+            tile = self.tilemap[key]
+            if tile["type"] == tile_type and tile["variant"] == variant:
+                return None
+            self.remove_tile(pos)
+        tile = {"type": tile_type, "variant": variant, "pos": list(pos)}
+        self.tilemap[key] = tile
+        self.grid_index.setdefault((tile_type, variant), {})[key] = tile
+        if tile_type in PHYSICS_TILES:
+            self.sight_cache = {}
+        for listener in self.listeners:
+            listener(pos)
+        return tile
+
+    def remove_tile(self, pos):
+        tile = self.tilemap.pop(f"{pos[0]};{pos[1]}", None)
+        if tile:
+            del self.grid_index[(tile["type"], tile["variant"])][f"{pos[0]};{pos[1]}"]
+            if tile["type"] in PHYSICS_TILES:
+                self.sight_cache = {}
+            for listener in self.listeners:
+                listener(pos)
+        return tile
+
+    def add_offgrid(self, pos, tile_type, variant=0):
+        tile = {"type": tile_type, "variant": variant, "pos": list(pos)}
+        self.offgrid_tiles.append(tile)
+        self.offgrid_index.setdefault((tile_type, variant), []).append(tile)
+        self.offgrid_chunks.setdefault(self.offgrid_chunk(pos), []).append(tile)
+
+    def remove_offgrid(self, tile):
+        self.offgrid_tiles.remove(tile)
+        self.offgrid_index[(tile["type"], tile["variant"])].remove(tile)
+        self.offgrid_chunks[self.offgrid_chunk(tile["pos"])].remove(tile)
 
     def extract(self, id_pairs, keep=False):
         matches = []
 
-        for tile in self.offgrid_tiles.copy():
-            if (tile["type"], tile["variant"]) in id_pairs:
-                matches.append(tile.copy())
-                if not keep:
-                    self.offgrid_tiles.remove(tile)
+        for pair in id_pairs:
+            if pair not in self.offgrid_index:
+                continue
+            matches += [tile.copy() for tile in self.offgrid_index[pair]]
+            if not keep:
+                del self.offgrid_index[pair]
+                self.offgrid_tiles = [
+                    tile
+                    for tile in self.offgrid_tiles
+                    if (tile["type"], tile["variant"]) != pair
+                ]
+                self.offgrid_chunks = {
+                    chunk: [
+                        tile
+                        for tile in tiles
+                        if (tile["type"], tile["variant"]) != pair
+                    ]
+                    for chunk, tiles in self.offgrid_chunks.items()
+                }
 
-        for key in self.tilemap:
-            tile = self.tilemap[key]
-            if (tile["type"], tile["variant"]) in id_pairs:
+        for pair in id_pairs:
+            if pair not in self.grid_index:
+                continue
+            for key, tile in self.grid_index[pair].items():
                 matches.append(tile.copy())
-                matches[-1]["pos"] = matches[-1]["pos"].copy()
-                matches[-1]["pos"][0] *= self.tile_size
-                matches[-1]["pos"][1] *= self.tile_size
+                matches[-1]["pos"] = [
+                    tile["pos"][0] * self.tile_size,
+                    tile["pos"][1] * self.tile_size,
+                ]
                 if not keep:
                     del self.tilemap[key]
+            if not keep:
+                del self.grid_index[pair]
 
         return matches
 
+    def id_pairs(self):
+        return {pair for pair, tiles in self.grid_index.items() if tiles} | {
+            pair for pair, tiles in self.offgrid_index.items() if tiles
+        }
+
+    def tiles(self, id_pairs):
+        for pair in id_pairs:
+            yield from self.offgrid_index.get(pair, [])
+            yield from self.grid_index.get(pair, {}).values()
+
+    def count(self, id_pairs):
+        return sum(
+            len(self.offgrid_index.get(pair, [])) + len(self.grid_index.get(pair, {}))
+            for pair in id_pairs
+        )
+
+    def bounding_box(self, id_pairs=None):
+        # (left, top, right, bottom) grid cells, of every grid tile by default
+        if id_pairs is None:
+            id_pairs = self.grid_index
+        xs = []
+        ys = []
+        for pair in id_pairs:
+            for tile in self.grid_index.get(pair, {}).values():
+                xs.append(tile["pos"][0])
+                ys.append(tile["pos"][1])
+        if not xs:
+            return (0, 0, 0, 0)
+        return (min(xs), min(ys), max(xs), max(ys))
+
     def tiles_around(self, pos):
         tiles = []
         tile_location = (int(pos[0] // self.tile_size), int(pos[1] // self.tile_size))
@@ -74,18 +207,24 @@ class Tilemap:
         return tiles
 
     def physics_rects_around(self, pos):
-        rects = []
-        for tile in self.tiles_around(pos):
-            if tile["type"] in PHYSICS_TILES:
-                rects.append(
-                    pygame.Rect(
-                        tile["pos"][0] * self.tile_size,
-                        tile["pos"][1] * self.tile_size,
+        # collisions ask for these every frame, so each cell's rect is made once
+        # and kept, and the rects must not be changed
+        tile_location = (int(pos[0] // self.tile_size), int(pos[1] // self.tile_size))
+        for offset in NEIGHBOR_OFFSETS:
+            x = tile_location[0] + offset[0]
+            y = tile_location[1] + offset[1]
+            key = f"{x};{y}"
+            if key in self.tilemap and self.tilemap[key]["type"] in PHYSICS_TILES:
+                rect = self.cell_rects.get(key)
+                if rect is None:
+                    rect = pygame.Rect(
+                        x * self.tile_size,
+                        y * self.tile_size,
                         self.tile_size,
                         self.tile_size,
                     )
-                )
-        return rects
+                    self.cell_rects[key] = rect
+                yield rect
 
     def is_solid(self, pos):
         key = f"{int(pos[0]//self.tile_size)};{int(pos[1]//self.tile_size)}"
@@ -93,6 +232,64 @@ class Tilemap:
             return True
         return False
 
+    def raycast(self, start, end):
+        # walks every cell the segment crosses in order (DDA), and returns the
+        # point and cell where it first enters a solid tile, or None
+        tile_size = self.tile_size
+        x, y = int(start[0] // tile_size), int(start[1] // tile_size)
+        end_cell = (int(end[0] // tile_size), int(end[1] // tile_size))
+        delta = (end[0] - start[0], end[1] - start[1])
+        step_x = 1 if delta[0] > 0 else -1
+        step_y = 1 if delta[1] > 0 else -1
+
+        # how far along the segment the next vertical and horizontal borders are
+        if delta[0]:
+            next_x = ((x + (step_x > 0)) * tile_size - start[0]) / delta[0]
+            step_length_x = tile_size / abs(delta[0])
+        else:
+            next_x = step_length_x = math.inf
+        if delta[1]:
+            next_y = ((y + (step_y > 0)) * tile_size - start[1]) / delta[1]
+            step_length_y = tile_size / abs(delta[1])
+        else:
+            next_y = step_length_y = math.inf
+
+        along = 0
+        while along <= 1:
+            key = f"{x};{y}"
+            if key in self.tilemap and self.tilemap[key]["type"] in PHYSICS_TILES:
+                return (
+                    (start[0] + delta[0] * along, start[1] + delta[1] * along),
+                    (x, y),
+                )
+            if (x, y) == end_cell:
+                break
+            if next_x < next_y:
+                along = next_x
+                next_x += step_length_x
+                x += step_x
+            else:
+                along = next_y
+                next_y += step_length_y
+                y += step_y
+        return None
+
+    def in_sight(self, start, end):
+        # answered once per pair of cells, with a ray between their centers
+        tile_size = self.tile_size
+        cells = (
+            (int(start[0] // tile_size), int(start[1] // tile_size)),
+            (int(end[0] // tile_size), int(end[1] // tile_size)),
+        )
+        if cells not in self.sight_cache:
+            if len(self.sight_cache) >= SIGHT_CACHE_SIZE:
+                self.sight_cache.clear()
+            self.sight_cache[cells] = not self.raycast(
+                ((cells[0][0] + 0.5) * tile_size, (cells[0][1] + 0.5) * tile_size),
+                ((cells[1][0] + 0.5) * tile_size, (cells[1][1] + 0.5) * tile_size),
+            )
+        return self.sight_cache[cells]
+
     def autotile(self):
         for key in self.tilemap:
             tile = self.tilemap[key]
@@ -106,50 +303,100 @@ class Tilemap:
                     neighbors.add(shift)
             neighbors = tuple(sorted(neighbors))
             if tile["type"] in AUTOTILE_TYPES and (neighbors in AUTOTILE_MAP):
-                tile["variant"] = AUTOTILE_MAP[neighbors]
+                variant = AUTOTILE_MAP[neighbors]
+                if variant != tile["variant"]:
+                    # tiles are replaced, never changed, see save_data
+                    del self.grid_index[(tile["type"], tile["variant"])][key]
+                    tile = {**tile, "variant": variant}
+                    self.tilemap[key] = tile
+                    self.grid_index.setdefault((tile["type"], variant), {})[key] = tile
 
-    def render(self, surface, offset=(0, 0)):
-        for tile in self.offgrid_tiles:
-            surface.blit(
-                self.game.assets[tile["type"]][tile["variant"]],
-                (tile["pos"][0] - offset[0], tile["pos"][1] - offset[1]),
+    def render(self, surface, offset=(0, 0), tile_range=None):
+        # render only the tiles that will be on screen
+        if not tile_range:
+            tile_range = (
+                (
+                    offset[0] // self.tile_size,
+                    (offset[0] + surface.get_width()) // self.tile_size + 1,
+                ),
+                (
+                    offset[1] // self.tile_size,
+                    (offset[1] + surface.get_height()) // self.tile_size + 1,
+                ),
             )
 
-        # render only the tiles that will be on screen
-        for x in range(
-            offset[0] // self.tile_size,
-            (offset[0] + surface.get_width()) // self.tile_size + 1,
+        # offgrid tiles are drawn first, from the chunks on screen and the ones
+        # left of and above it that images can reach out of
+        blits = []
+        for chunk_x in range(
+            (tile_range[0][0] * self.tile_size - OFFGRID_MARGIN) // OFFGRID_CHUNK_SIZE,
+            tile_range[0][1] * self.tile_size // OFFGRID_CHUNK_SIZE + 1,
         ):
-            for y in range(
-                offset[1] // self.tile_size,
-                (offset[1] + surface.get_height()) // self.tile_size + 1,
+            for chunk_y in range(
+                (tile_range[1][0] * self.tile_size - OFFGRID_MARGIN)
+                // OFFGRID_CHUNK_SIZE,
+                tile_range[1][1] * self.tile_size // OFFGRID_CHUNK_SIZE + 1,
             ):
+                for tile in self.offgrid_chunks.get((chunk_x, chunk_y), []):
+                    blits.append(
+                        (
+                            self.game.assets[tile["type"]][tile["variant"]],
+                            (tile["pos"][0] - offset[0], tile["pos"][1] - offset[1]),
+                        )
+                    )
+
+        for x in range(tile_range[0][0], tile_range[0][1]):
+            for y in range(tile_range[1][0], tile_range[1][1]):
                 key = f"{x};{y}"
                 if key in self.tilemap:
                     tile = self.tilemap[key]
-                    surface.blit(
-                        self.game.assets[tile["type"]][tile["variant"]],
+                    blits.append(
                         (
-                            tile["pos"][0] * self.tile_size - offset[0],
-                            tile["pos"][1] * self.tile_size - offset[1],
-                        ),
+                            self.game.assets[tile["type"]][tile["variant"]],
+                            (
+                                tile["pos"][0] * self.tile_size - offset[0],
+                                tile["pos"][1] * self.tile_size - offset[1],
+                            ),
+                        )
                     )
 
+        surface.blits(blits, False)
+
+    def save_data(self):
+        # tiles are replaced instead of changed, so copying the containers is
+        # enough to get a snapshot that later edits don't touch
+        return {
+            "tilemap": dict(self.tilemap),
+            "tile_size": self.tile_size,
+            "offgrid": list(self.offgrid_tiles),
+        }
+
     def save(self, map_name):
-        with open(os.path.join(BASE_MAP_PATH, f"{map_name}.json"), "w") as file:
-            json.dump(
-                {
-                    "tilemap": self.tilemap,
-                    "tile_size": self.tile_size,
-                    "offgrid": self.offgrid_tiles,
-                },
-                file,
-            )
+        write_map(map_name, self.save_data())
+
+    def copy_from(self, tilemap):
+        # tiles are shared, only the containers that extract changes are copied
+        self.tilemap = dict(tilemap.tilemap)
+        self.tile_size = tilemap.tile_size
+        self.offgrid_tiles = list(tilemap.offgrid_tiles)
+        self.sight_cache = {}
+        self.cell_rects = {}
+        self.grid_index = {
+            pair: dict(tiles) for pair, tiles in tilemap.grid_index.items()
+        }
+        self.offgrid_index = {
+            pair: list(tiles) for pair, tiles in tilemap.offgrid_index.items()
+        }
+        self.offgrid_chunks = {
+            chunk: list(tiles) for chunk, tiles in tilemap.offgrid_chunks.items()
+        }
 
     def load(self, map_name):
-        with open(os.path.join(BASE_MAP_PATH, f"{map_name}.json"), "r") as file:
-            data = json.load(file)
+        data = json.loads(bytes(read_data(f"maps/{map_name}.json")))
 
         self.tilemap = data["tilemap"]
         self.tile_size = data["tile_size"]
         self.offgrid_tiles = data["offgrid"]
+        self.sight_cache = {}
+        self.cell_rects = {}
+        self.reindex()
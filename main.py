@@ -1,21 +1,67 @@
 import sys
 
-from classes.game import Game
-from classes.editor import Editor
-
+from scripts import timing
 
+# modules are imported by the mode that needs them, to start faster
 if __name__ == "__main__":
     if "--editor" in sys.argv:
+        from classes.editor import Editor
+
         try:
             map_name = sys.argv[sys.argv.index("--editor") + 1]
         except:
             map_name = ""
-        Editor(map_name).run()
-    elif "--custom-map" in sys.argv:
-        try:
-            map_name = sys.argv[sys.argv.index("--custom-map") + 1]
-        except:
+        if map_name.startswith("--"):
             map_name = ""
-        Game(map_name).run()
+        autosave = None
+        if "--autosave" in sys.argv:
+            autosave = float(sys.argv[sys.argv.index("--autosave") + 1])
+        Editor(map_name, autosave).run()
+    elif "--replay" in sys.argv:
+        from classes.replay import Replay
+
+        capture_path = None
+        if "--capture" in sys.argv:
+            capture_path = sys.argv[sys.argv.index("--capture") + 1]
+        Replay.load(sys.argv[sys.argv.index("--replay") + 1]).run(capture_path)
     else:
-        Game().run()
+        from classes.game import Game
+
+        timing.mark("imports")
+
+        map_name = ""
+        if "--custom-map" in sys.argv:
+            try:
+                map_name = sys.argv[sys.argv.index("--custom-map") + 1]
+            except:
+                map_name = ""
+        seed = None
+        if "--seed" in sys.argv:
+            seed = int(sys.argv[sys.argv.index("--seed") + 1])
+        memory = None
+        if "--memory-report" in sys.argv:
+            from classes.memory import MemoryMonitor
+
+            memory = MemoryMonitor(sys.argv[sys.argv.index("--memory-report") + 1])
+        game = Game(
+            map_name,
+            seed,
+            fast_start="--fast-start" in sys.argv,
+            pipelined="--pipelined" in sys.argv,
+            lighting="--lighting" in sys.argv,
+        )
+        game.startup_report = "--startup-report" in sys.argv
+        game.memory = memory
+        if "--capture" in sys.argv:
+            from classes.capture import FrameCapture
+
+            game.capture = FrameCapture(
+                sys.argv[sys.argv.index("--capture") + 1], game.secondary_display
+            )
+        if "--record" in sys.argv:
+            from classes.replay import InputRecorder
+
+            game.recorder = InputRecorder(
+                sys.argv[sys.argv.index("--record") + 1], game
+            )
+        game.run()
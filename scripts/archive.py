@@ -0,0 +1,89 @@
+import os
+import sys
+import json
+import mmap
+import struct
+
+ARCHIVE_MAGIC = b"MFPA"
+ARCHIVE_VERSION = 1
+HEADER = struct.Struct("<4sBI")  # magic, version, index size
+
+
+class Archive:
+    def __init__(self, path) -> None:
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.data)
+
+        magic, version, index_size = HEADER.unpack_from(self.data)
+        if magic != ARCHIVE_MAGIC or version != ARCHIVE_VERSION:
+            raise ValueError(f"{path} is not a version {ARCHIVE_VERSION} archive")
+        # path -> [offset, size] or [offset, size, width, height] for images
+        self.index = json.loads(self.data[HEADER.size : HEADER.size + index_size])
+        self.start = HEADER.size + index_size
+
+    def __contains__(self, path):
+        return path in self.index
+
+    def read(self, path):
+        # a slice of the mapped file, nothing is copied
+        if path not in self.index:
+            raise FileNotFoundError(path)
+        offset, size = self.index[path][:2]
+        return self.view[self.start + offset : self.start + offset + size]
+
+    def image_size(self, path):
+        return tuple(self.index[path][2:4])
+
+    def listdir(self, path):
+        prefix = path.rstrip("/") + "/"
+        return sorted(
+            {
+                name[len(prefix) :].split("/")[0]
+                for name in self.index
+                if name.startswith(prefix)
+            }
+        )
+
+
+def pack(data_path, archive_path):
+    import pygame
+
+    entries = []  # [path, bytes, image size]
+    for root, dirs, files in os.walk(data_path):
+        dirs.sort()
+        for file_name in sorted(files):
+            file_path = os.path.join(root, file_name)
+            path = os.path.relpath(file_path, data_path).replace(os.sep, "/")
+            if file_name.endswith(".png"):
+                # images are stored decoded, so loading them is a plain copy
+                img = pygame.image.load(file_path)
+                entries.append(
+                    [path, pygame.image.tobytes(img, "RGBA"), img.get_size()]
+                )
+            else:
+                with open(file_path, "rb") as file:
+                    entries.append([path, file.read(), None])
+
+    # offsets are relative to the end of the index
+    index = {}
+    offset = 0
+    for path, data, size in entries:
+        index[path] = [offset, len(data)] + (list(size) if size else [])
+        offset += len(data)
+    index_data = json.dumps(index).encode()
+
+    with open(archive_path, "wb") as file:
+        file.write(HEADER.pack(ARCHIVE_MAGIC, ARCHIVE_VERSION, len(index_data)))
+        file.write(index_data)
+        for path, data, size in entries:
+            file.write(data)
+
+    print(f"Packed {len(entries)} files into {archive_path}.")
+
+
+if __name__ == "__main__":
+    pack(
+        sys.argv[1] if len(sys.argv) > 1 else "data",
+        sys.argv[2] if len(sys.argv) > 2 else "data.pak",
+    )
@@ -0,0 +1,120 @@
+import os
+import sys
+import time
+import random
+
+import pygame
+
+from classes.tilemap import Tilemap
+from scripts.utils import load_images
+
+DEFAULTS = {
+    "width": 200,
+    "height": 60,
+    "terrain": 0.3,
+    "decor": 0.1,
+    "enemies": 20,
+    "trees": 10,
+    "seed": 0,
+}
+
+
+def generate(width, height, terrain, decor, enemies, trees, seed):
+    rng = random.Random(seed)
+    tilemap = Tilemap(None, 16)
+    tile_size = tilemap.tile_size
+
+    # rolling ground, filled all the way down to the bottom of the map
+    ground = []
+    level = height * 2 // 3
+    for x in range(width):
+        if rng.random() < 0.3:
+            level = max(height // 3, min(height - 2, level + rng.choice([-1, 1])))
+        ground.append(level)
+        for y in range(level, height):
+            tilemap.set_tile((x, y), "grass")
+
+    # floating stone platforms, more of them the denser the terrain
+    for x in range(width):
+        for y in range(2, ground[x] - 4):
+            if rng.random() < terrain * 0.01:
+                for i in range(rng.randint(3, 8)):
+                    if x + i < width and y < ground[x + i] - 4:
+                        tilemap.set_tile((x + i, y), "stone")
+
+    tilemap.autotile()
+
+    # every empty cell standing on a solid tile
+    surfaces = [
+        (tile["pos"][0], tile["pos"][1] - 1)
+        for tile in tilemap.tilemap.values()
+        if f"{tile['pos'][0]};{tile['pos'][1] - 1}" not in tilemap.tilemap
+    ]
+    rng.shuffle(surfaces)
+
+    # spawners are offgrid like in the hand made maps, the player starts on the
+    # leftmost ground
+    tilemap.add_offgrid([0, (ground[0] - 1) * tile_size], "spawners", 0)
+    free = [cell for cell in surfaces if cell != (0, ground[0] - 1)]
+
+    for x, y in free[:enemies]:
+        tilemap.add_offgrid([x * tile_size, y * tile_size], "spawners", 1)
+    free = free[enemies:]
+
+    # trees and large decor sit on the ground, so they are placed by their height
+    # images are read like the game reads them, so a packed archive works too,
+    # and loading converts them, which needs some display
+    if not pygame.display.get_surface():
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        pygame.display.init()
+        pygame.display.set_mode((1, 1))
+    large_decor_heights = [img.get_height() for img in load_images("tiles/large_decor")]
+    for x, y in free[:trees]:
+        tilemap.add_offgrid(
+            [x * tile_size, (y + 1) * tile_size - large_decor_heights[2]],
+            "large_decor",
+            2,
+        )
+    free = free[trees:]
+
+    for x, y in free[: int(len(free) * decor)]:
+        if rng.random() < 0.5:
+            tilemap.set_tile((x, y), "decor", rng.randint(0, 3))
+        else:
+            variant = rng.randint(0, 1)
+            tilemap.add_offgrid(
+                [x * tile_size, (y + 1) * tile_size - large_decor_heights[variant]],
+                "large_decor",
+                variant,
+            )
+
+    return tilemap
+
+
+def main(argv):
+    if not argv or argv[0].startswith("--"):
+        print(
+            "usage: python -m scripts.generate_map <map name> [--width N] [--height N]"
+            " [--terrain 0-1] [--decor 0-1] [--enemies N] [--trees N] [--seed N]"
+        )
+        return 1
+
+    map_name = argv[0]
+    options = dict(DEFAULTS)
+    for name in options:
+        if f"--{name}" in argv:
+            value = argv[argv.index(f"--{name}") + 1]
+            options[name] = float(value) if name in {"terrain", "decor"} else int(value)
+
+    start_time = time.time()
+    tilemap = generate(**options)
+    tilemap.save(map_name)
+    print(
+        f"Generated {map_name} with {len(tilemap.tilemap)} tiles and "
+        f"{len(tilemap.offgrid_tiles)} offgrid tiles in {time.time() - start_time:.1f}s."
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,38 @@
+import os
+import time
+
+
+def process_age():
+    # seconds since the process was created, linux only, 0 elsewhere
+    try:
+        with open("/proc/self/stat") as file:
+            start_ticks = int(file.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as file:
+            uptime = float(file.read().split()[0])
+        return max(0, uptime - start_ticks / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError, AttributeError):
+        return 0
+
+
+START_TIME = time.perf_counter() - process_age()
+marks = [("process start", START_TIME)]
+
+
+def mark(name):
+    marks.append((name, time.perf_counter()))
+
+
+def marked(name):
+    return any(mark_name == name for mark_name, mark_time in marks)
+
+
+def restart(name):
+    # a later startup in the same process is timed on its own
+    marks[:] = [(name, time.perf_counter())]
+
+
+def report():
+    print("Startup timing:")
+    for (name, mark_time), (last_name, last_time) in zip(marks[1:], marks):
+        print(f"    {name:<16}{(mark_time - last_time) * 1000:8.1f} ms")
+    print(f"    {'total':<16}{(marks[-1][1] - marks[0][1]) * 1000:8.1f} ms")
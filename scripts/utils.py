@@ -1,16 +1,60 @@
+import io
 import os
 import pygame
 
+from scripts.archive import Archive
+
+BASE_DATA_PATH = "data/"
 BASE_IMG_PATH = "data/images/"
+ARCHIVE_PATH = "data.pak"
+
+# releases ship one packed archive, development reads the loose data/ folder
+archive = Archive(ARCHIVE_PATH) if os.path.exists(ARCHIVE_PATH) else None
+
+
+def in_archive(path):
+    # a loose file wins, so maps saved by the editor or the generator are never
+    # hidden by an older packed copy
+    return (
+        archive
+        and path in archive
+        and not os.path.exists(os.path.join(BASE_DATA_PATH, path))
+    )
+
+
+def read_data(path):
+    if in_archive(path):
+        return archive.read(path)
+    with open(os.path.join(BASE_DATA_PATH, path), "rb") as file:
+        return file.read()
+
+
+def open_data(path):
+    if in_archive(path):
+        return io.BytesIO(archive.read(path))
+    return open(os.path.join(BASE_DATA_PATH, path), "rb")
+
+
+def list_data(path):
+    names = set(archive.listdir(path)) if archive else set()
+    if os.path.isdir(os.path.join(BASE_DATA_PATH, path)):
+        names.update(os.listdir(os.path.join(BASE_DATA_PATH, path)))
+    return sorted(names)
 
 
 def load_image(path):
-    img = pygame.image.load(os.path.join(BASE_IMG_PATH, path)).convert()
+    archive_path = f"images/{path}".replace(os.sep, "/")
+    if in_archive(archive_path):
+        img = pygame.image.frombuffer(
+            archive.read(archive_path), archive.image_size(archive_path), "RGBA"
+        ).convert()
+    else:
+        img = pygame.image.load(os.path.join(BASE_IMG_PATH, path)).convert()
     img.set_colorkey((0, 0, 0))
     return img
 
 
 def load_images(path):
-    image_names = sorted(os.listdir(os.path.join(BASE_IMG_PATH, path)))
+    image_names = list_data(f"images/{path}")
     image_paths = [os.path.join(path, image_name) for image_name in image_names]
     return [load_image(image_path) for image_path in image_paths]
@@ -0,0 +1,171 @@
+import os
+import sys
+import copy
+from multiprocessing import Pool
+
+from classes.navigation import solid_cells, walkable_cells, ground_cell
+from classes.tilemap import Tilemap
+from scripts.utils import list_data
+
+DECOR_TYPES = {"decor", "large_decor"}
+PLAYER_JUMP = 3  # cells a jump rises
+PLAYER_WALL_JUMP = 2  # cells a wall jump rises
+PLAYER_DRIFT = 4  # cells the player moves sideways in the air
+
+
+def tile_variant_counts():
+    return {
+        tile_type: len(list_data(f"images/tiles/{tile_type}"))
+        for tile_type in list_data("images/tiles")
+    }
+
+
+def reachable_cells(solid, walkable, start, box):
+    # cells the player can get to from start, found without simulating the
+    # player. the ground is the same the enemies walk on, and rising is only
+    # possible for a few cells after a jump from it or from a wall
+    reached = set()
+    seen = set()
+    stack = [(start, PLAYER_JUMP, PLAYER_DRIFT)]
+    while stack:
+        state = stack.pop()
+        if state in seen:
+            continue
+        seen.add(state)
+        (x, y), rise, drift = state
+        reached.add((x, y))
+
+        moves = [((x, y + 1), 0, drift)]  # fall
+        if rise:
+            moves.append(((x, y - 1), rise - 1, drift))
+        if drift:
+            moves.append(((x - 1, y), rise, drift - 1))
+            moves.append(((x + 1, y), rise, drift - 1))
+        if drift and (x, y) not in walkable:
+            for side in [-1, 1]:
+                # wall jump, away from the wall
+                if (x + side, y) in solid:
+                    moves.append(((x - side, y - 1), PLAYER_WALL_JUMP - 1, drift - 1))
+
+        for cell, rise, drift in moves:
+            if cell in solid:
+                continue
+            if not (box[0] - 1 <= cell[0] <= box[2] + 1):
+                continue
+            if not (box[1] - 1 <= cell[1] <= box[3] + 1):
+                continue
+            if cell in walkable:
+                rise, drift = PLAYER_JUMP, PLAYER_DRIFT
+            stack.append((cell, rise, drift))
+    return reached
+
+
+def validate_map(args):
+    map_name, variant_counts = args
+    errors = []
+
+    tilemap = Tilemap(None, 16)
+    try:
+        tilemap.load(map_name)
+    except (OSError, ValueError, KeyError) as e:
+        return map_name, [f"could not be loaded: {e}"], None
+
+    # tile types and variants
+    for tile in list(tilemap.tilemap.values()) + tilemap.offgrid_tiles:
+        if tile["type"] not in variant_counts:
+            errors.append(f"unknown tile type {tile['type']} at {tile['pos']}")
+        elif not (0 <= tile["variant"] < variant_counts[tile["type"]]):
+            errors.append(
+                f"unknown variant {tile['variant']} of {tile['type']} at {tile['pos']}"
+            )
+    for key, tile in tilemap.tilemap.items():
+        if key != f"{tile['pos'][0]};{tile['pos'][1]}":
+            errors.append(f"tile {key} is stored with position {tile['pos']}")
+
+    # spawners
+    spawners = tilemap.extract([("spawners", 0), ("spawners", 1)], True)
+    players = [spawner for spawner in spawners if spawner["variant"] == 0]
+    enemies = [spawner for spawner in spawners if spawner["variant"] == 1]
+    if len(players) != 1:
+        errors.append(f"has {len(players)} player spawners instead of 1")
+    if not len(enemies):
+        errors.append("has no enemy spawners")
+
+    # autotile seams
+    autotiled = copy.deepcopy(tilemap)
+    autotiled.autotile()
+    for key, tile in tilemap.tilemap.items():
+        if autotiled.tilemap[key]["variant"] != tile["variant"]:
+            errors.append(f"tile {key} is not autotiled")
+
+    # reachability
+    box = tilemap.bounding_box()
+    if len(players):
+        # spawners are looked up on the ground they stand on
+        solid = solid_cells(tilemap)
+        walkable = walkable_cells(solid)
+        start = (
+            int(players[0]["pos"][0] // tilemap.tile_size),
+            int(players[0]["pos"][1] // tilemap.tile_size),
+        )
+        reached = reachable_cells(solid, walkable, start, box)
+        for enemy in enemies:
+            cell = ground_cell(
+                walkable,
+                (
+                    int(enemy["pos"][0] // tilemap.tile_size),
+                    int(enemy["pos"][1] // tilemap.tile_size),
+                ),
+            )
+            if cell not in reached:
+                errors.append(f"enemy at {enemy['pos']} cannot be reached")
+
+    stats = {
+        "tiles": len(tilemap.tilemap),
+        "offgrid": len(tilemap.offgrid_tiles),
+        "decor": tilemap.count(
+            [pair for pair in tilemap.id_pairs() if pair[0] in DECOR_TYPES]
+        ),
+        "enemies": len(enemies),
+        "bbox": box,
+    }
+    return map_name, errors, stats
+
+
+def main(argv):
+    jobs = None
+    if "--jobs" in argv:
+        jobs = int(argv[argv.index("--jobs") + 1])
+        del argv[argv.index("--jobs") : argv.index("--jobs") + 2]
+
+    map_names = argv or sorted(
+        os.path.splitext(file_name)[0]
+        for file_name in list_data("maps")
+        if file_name.endswith(".json")
+    )
+    variant_counts = tile_variant_counts()
+
+    failed = 0
+    with Pool(jobs) as pool:
+        for map_name, errors, stats in pool.imap(
+            validate_map, [(map_name, variant_counts) for map_name in map_names]
+        ):
+            if stats:
+                print(
+                    f"{map_name}: {stats['tiles']} tiles, {stats['offgrid']} offgrid, "
+                    f"{stats['decor']} decor, {stats['enemies']} enemies, "
+                    f"bbox {stats['bbox']}"
+                )
+            else:
+                print(f"{map_name}:")
+            for error in errors:
+                print(f"    {error}")
+            if errors:
+                failed += 1
+
+    print(f"{len(map_names) - failed}/{len(map_names)} maps passed.")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))